@@ -0,0 +1,264 @@
+import csv
+import json
+import os
+import random
+import utils.io as utils_io
+
+WORDS = ["the", "a", "of", "to", "and", "in", "is", "for", "on", "that", "with", "says", "said", "will", "was",
+         "president", "trump", "obama", "clinton", "senate", "house", "white", "bill", "health", "care", "tax",
+         "plan", "vote", "voters", "election", "fraud", "police", "border", "wall", "court", "judge", "state",
+         "news", "fake", "report", "video", "shows", "claims", "million", "people", "billion", "dollars", "new",
+         "law", "government", "shutdown", "deal", "trade", "china", "russia", "probe", "emails", "fbi", "director",
+         "democrats", "republicans", "congress", "campaign", "rally", "supporters", "protest", "city", "fire",
+         "storm", "hurricane", "earthquake", "school", "students", "teachers", "jobs", "economy", "market",
+         "stocks", "crash", "war", "military", "troops", "attack", "killed", "shooting", "gun", "ban", "immigration",
+         "refugees", "travel", "airport", "hospital", "doctors", "vaccine", "study", "science", "climate", "change"]
+HASHTAGS = ["FakeNews", "MAGA", "Trump2020", "BREAKING", "TravelBan", "NoWall", "HealthCare", "Election2016",
+            "ClimateChange", "fakenews", "breakingnews", "Russia"]
+EMOJIS = ["\U0001F600", "\U0001F602", "\U0001F64F", "\U0001F680", "☀", "⚡"]
+SOURCES = ["CNN", "Fox News", "Washington Post", "AP", "Reuters", "Politico"]
+DOMAINS = ["https://www.cnn.com", "https://www.foxnews.com", "https://www.politico.com", "http://bit.ly",
+           "https://t.co", "http://www.infowars.com", "https://www.nytimes.com"]
+FNC_STANCES = ["agree", "disagree", "discuss", "unrelated"]
+RUMOR_STANCES = ["support", "deny", "comment", "comment", "query"]
+
+
+class TextGenerator(object):
+    """Random headlines, tweets and articles with hashtags, urls and emojis sprinkled like real data."""
+
+    def __init__(self, seed=9):
+        self.rng = random.Random(seed)
+
+    def words(self, min_words, max_words):
+        return " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(min_words, max_words)))
+
+    def url(self):
+        return "{}/{}".format(self.rng.choice(DOMAINS),
+                              "".join(self.rng.choice("abcdefghXYZ0123456789") for _ in range(10)))
+
+    def headline(self):
+        return self.words(6, 14).capitalize()
+
+    def tweet(self, quoted=None):
+        parts = [self.words(4, 18)]
+        if quoted is not None and self.rng.random() < 0.6:
+            parts.append(quoted)
+        if self.rng.random() < 0.4:
+            parts.append("#{}".format(self.rng.choice(HASHTAGS)))
+        if self.rng.random() < 0.5:
+            parts.append(self.url())
+        if self.rng.random() < 0.15:
+            parts.append(self.rng.choice(EMOJIS))
+        if self.rng.random() < 0.15:
+            parts.append("via @{}".format(self.rng.choice(SOURCES).replace(" ", "").lower()))
+        return " ".join(parts)
+
+    def article(self, min_paragraphs=2, max_paragraphs=8):
+        return "\n".join(self.words(30, 90) for _ in range(self.rng.randint(min_paragraphs, max_paragraphs)))
+
+    def tweet_id(self):
+        return self.rng.randint(10 ** 17, 10 ** 18 - 1)
+
+
+def write_json(content, path):
+    with open(utils_io.ensure_path(path), "w", encoding="utf-8") as f:
+        json.dump(content, f)
+
+
+def tweet_json(tweet_id, text, urls):
+    return {
+        "id": tweet_id,
+        "id_str": str(tweet_id),
+        "text": text,
+        "entities": {"urls": [{"expanded_url": url} for url in urls], "hashtags": []},
+        "user": {"id": tweet_id % 100000, "screen_name": "user{}".format(tweet_id % 100000)}
+    }
+
+
+def generate_vocabulary(path):
+    utils_io.save_list_as_text(WORDS, utils_io.ensure_path(path))
+    return len(WORDS)
+
+
+def generate_fnc(fnc_root, num_stances, num_bodies=None, seed=9):
+    """FakeNewsChallenge train_bodies.csv and train_stances.csv."""
+    text_generator = TextGenerator(seed)
+    num_bodies = num_bodies if num_bodies is not None else max(1, num_stances // 30)
+    with open(utils_io.ensure_path(os.path.join(fnc_root, "train_bodies.csv")), "w", encoding="utf-8",
+              newline="") as f:
+        csv_writer = csv.writer(f, delimiter=",", quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        csv_writer.writerow(["Body ID", "articleBody"])
+        for body_id in range(num_bodies):
+            csv_writer.writerow([body_id, text_generator.article()])
+    with open(os.path.join(fnc_root, "train_stances.csv"), "w", encoding="utf-8", newline="") as f:
+        csv_writer = csv.writer(f, delimiter=",", quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        csv_writer.writerow(["Headline", "Body ID", "Stance"])
+        for _ in range(num_stances):
+            csv_writer.writerow([text_generator.headline(), text_generator.rng.randrange(num_bodies),
+                                 text_generator.rng.choice(FNC_STANCES)])
+    return num_stances
+
+
+def generate_fnn(fnn_root, num_news, tweets_per_news, seed=9):
+    """FakeNewsNet politifact/<label>/<news_id>/{news content.json,tweets/*.json} trees."""
+    text_generator = TextGenerator(seed)
+    num_tweets = 0
+    for news_label in ["fake", "real"]:
+        news_label_dir = os.path.join(fnn_root, "politifact", news_label)
+        for news_idx in range(num_news):
+            news_dir = os.path.join(news_label_dir, "politifact{}{}".format(news_label, news_idx))
+            title = text_generator.headline()
+            write_json({
+                "url": text_generator.url(),
+                "title": title,
+                "text": text_generator.article(),
+                "meta_data": {"description": text_generator.words(15, 40)}
+            }, os.path.join(news_dir, "news content.json"))
+            title_words = title.split()
+            for _ in range(text_generator.rng.randint(tweets_per_news // 2, tweets_per_news * 3 // 2)):
+                start = text_generator.rng.randrange(len(title_words))
+                quoted = " ".join(title_words[start: start + text_generator.rng.randint(2, 6)])
+                tweet_id = text_generator.tweet_id()
+                urls = [text_generator.url() for _ in range(text_generator.rng.randint(0, 2))]
+                write_json(tweet_json(tweet_id, text_generator.tweet(quoted), urls),
+                           os.path.join(news_dir, "tweets", "{}.json".format(tweet_id)))
+                num_tweets += 1
+    return num_tweets
+
+
+def _reply_structure(text_generator, tweet_ids, max_depth):
+    """Random nested {tweet_id: {reply_id: ...}} thread over the given reply ids, leaves are []."""
+    structure = {}
+    parents = [(structure, 0)]
+    for tweet_id in tweet_ids:
+        parent, depth = text_generator.rng.choice(parents)
+        parent[tweet_id] = {}
+        if depth + 1 < max_depth:
+            parents.append((parent[tweet_id], depth + 1))
+    _mark_leaves(structure)
+    return structure
+
+
+def _mark_leaves(structure):
+    for tweet_id, replies in structure.items():
+        if len(replies) == 0:
+            structure[tweet_id] = []
+        else:
+            _mark_leaves(replies)
+
+
+def _generate_discourses(text_generator, data_dir, num_discourses, replies_per_discourse, headline_rows,
+                         max_depth=6):
+    labels, num_replies = {}, 0
+    topics = ["charliehebdo", "ferguson", "germanwings-crash", "ottawashooting", "sydneysiege"]
+    for discourse_idx in range(num_discourses):
+        source_id = str(text_generator.tweet_id())
+        discourse_dir = os.path.join(data_dir, topics[discourse_idx % len(topics)], source_id)
+        headline = text_generator.headline()
+        write_json(tweet_json(int(source_id), text_generator.tweet(headline), []),
+                   os.path.join(discourse_dir, "source-tweet", "{}.json".format(source_id)))
+        labels[source_id] = text_generator.rng.choice(["support", "deny"])
+        reply_ids = [str(text_generator.tweet_id()) for _ in range(replies_per_discourse)]
+        for reply_id in reply_ids:
+            write_json(tweet_json(int(reply_id), text_generator.tweet(), []),
+                       os.path.join(discourse_dir, "replies", "{}.json".format(reply_id)))
+            labels[reply_id] = text_generator.rng.choice(RUMOR_STANCES)
+        write_json({source_id: _reply_structure(text_generator, reply_ids, max_depth) or []},
+                   os.path.join(discourse_dir, "structure.json"))
+        with open(os.path.join(discourse_dir, "urls.dat"), "w", encoding="utf-8", newline="") as f:
+            csv_writer = csv.writer(f, delimiter="\t", quotechar='"')
+            for _ in range(text_generator.rng.randint(1, 3)):
+                url_id, full_url = str(len(headline_rows)), text_generator.url()
+                csv_writer.writerow([url_id, "https://t.co/{}".format(url_id), full_url])
+                headline_rows.append([url_id, full_url, headline, text_generator.rng.choice(SOURCES), "1"])
+        num_replies += replies_per_discourse + 1
+    return labels, num_replies
+
+
+def generate_rumor_eval_17(re_root, num_discourses, replies_per_discourse, seed=9):
+    """RumorEval 2017 rumoureval-data/<topic>/<discourse>/ trees, subtask A labels and crawled headlines."""
+    text_generator = TextGenerator(seed)
+    headline_rows = []
+    labels, num_tweets = _generate_discourses(text_generator, os.path.join(re_root, "rumoureval-data"),
+                                              num_discourses, replies_per_discourse, headline_rows)
+    label_items = list(labels.items())
+    split = len(label_items) * 4 // 5
+    write_json(dict(label_items[:split]), os.path.join(re_root, "traindev", "rumoureval-subtaskA-train.json"))
+    write_json(dict(label_items[split:]), os.path.join(re_root, "traindev", "rumoureval-subtaskA-dev.json"))
+    utils_io.write_csv(headline_rows, None, os.path.join(re_root, "headlines.csv"))
+    return num_tweets
+
+
+def generate_rumor_eval_19(re_root, num_discourses, replies_per_discourse, seed=9):
+    """RumorEval 2019 twitter-english/<topic>/<discourse>/ trees, train/dev keys and crawled headlines."""
+    text_generator = TextGenerator(seed)
+    traindev = os.path.join(re_root, "rumoureval-2019-training-data")
+    headline_rows = []
+    labels, num_tweets = _generate_discourses(text_generator, os.path.join(traindev, "twitter-english"),
+                                              num_discourses, replies_per_discourse, headline_rows)
+    label_items = list(labels.items())
+    split = len(label_items) * 4 // 5
+    write_json({"subtaskaenglish": dict(label_items[:split])}, os.path.join(traindev, "train-key.json"))
+    write_json({"subtaskaenglish": dict(label_items[split:])}, os.path.join(traindev, "dev-key.json"))
+    utils_io.write_csv(headline_rows, None, os.path.join(re_root, "headlines_twitter.csv"))
+    return num_tweets
+
+
+def generate_annotated_batches(annotated_root, num_batches, rows_per_batch, seed=9):
+    """Annotated batches/<batch>/fnn_{fake,real}_uncleaned.xlsx spreadsheets."""
+    import pandas as pd
+
+    text_generator = TextGenerator(seed)
+    num_rows = 0
+    for batch in range(num_batches):
+        for news_label in ["fake", "real"]:
+            rows = []
+            for _ in range(rows_per_batch):
+                target = text_generator.headline()
+                stance = text_generator.rng.choice(["support", "deny", "comment", "comment", "report"])
+                rows.append({
+                    "stance": stance,
+                    "source": text_generator.tweet(target),
+                    "target": target,
+                    "clean": 1 if text_generator.rng.random() < 0.9 else 0,
+                    "sentiment": text_generator.rng.choice(["negative", "neutral"]) if stance == "comment" else ""
+                })
+            path = os.path.join(annotated_root, "batches", "batch_{}".format(batch),
+                                "fnn_{}_uncleaned.xlsx".format(news_label))
+            pd.DataFrame(rows).to_excel(utils_io.ensure_path(path), index=False)
+            num_rows += rows_per_batch
+    return num_rows
+
+
+def generate_mrpc(mrpc_root, num_pairs, seed=9):
+    """MRPC msr_paraphrase_{train,test}.txt and mrpc_dev_ids.tsv."""
+    text_generator = TextGenerator(seed)
+    header = "Quality\t#1 ID\t#2 ID\t#1 String\t#2 String\n"
+    dev_ids = []
+    for file_name, size in [("msr_paraphrase_train.txt", num_pairs), ("msr_paraphrase_test.txt", num_pairs // 4)]:
+        with open(utils_io.ensure_path(os.path.join(mrpc_root, file_name)), "w", encoding="utf8") as f:
+            f.write(header)
+            for _ in range(size):
+                id1, id2 = str(text_generator.rng.randint(1, 10 ** 7)), str(text_generator.rng.randint(1, 10 ** 7))
+                f.write("{}\t{}\t{}\t{}\t{}\n".format(text_generator.rng.randint(0, 1), id1, id2,
+                                                      text_generator.words(8, 30), text_generator.words(8, 30)))
+                if file_name.endswith("train.txt") and text_generator.rng.random() < 0.1:
+                    dev_ids.append([id1, id2])
+    with open(os.path.join(mrpc_root, "mrpc_dev_ids.tsv"), "w", encoding="utf8") as f:
+        for id1, id2 in dev_ids:
+            f.write("{}\t{}\n".format(id1, id2))
+    return num_pairs + num_pairs // 4
+
+
+def generate_tweet_paraphrase(tweet_paraphrase_root, num_pairs, seed=9):
+    """Tweet paraphrase train.data: topic id, topic, sentence 1, sentence 2, (paraphrase, non paraphrase) votes."""
+    text_generator = TextGenerator(seed)
+    votes = ["(3, 2)", "(4, 1)", "(5, 0)", "(1, 4)", "(0, 5)", "(2, 3)"]
+    with open(utils_io.ensure_path(os.path.join(tweet_paraphrase_root, "train.data")), "w", encoding="utf-8",
+              newline="") as f:
+        csv_writer = csv.writer(f, delimiter="\t", quotechar='"')
+        for idx in range(num_pairs):
+            topic = text_generator.words(1, 3)
+            csv_writer.writerow([idx % 500, topic, text_generator.tweet(topic), text_generator.tweet(topic),
+                                 text_generator.rng.choice(votes)])
+    return num_pairs
@@ -0,0 +1,78 @@
+import argparse
+from difflib import SequenceMatcher
+import random
+import time
+import utils
+
+WORDS = ["trump", "obama", "clinton", "senate", "bill", "health", "care", "vote", "news", "fake", "report",
+         "says", "claims", "president", "white", "house", "tax", "plan", "million", "people", "video", "shows",
+         "police", "border", "wall", "election", "fraud", "voters", "state", "court"]
+
+
+def add_arguments(parser):
+    parser.add_argument("--num-news", type=int, default=200, help="Number of synthetic news items")
+    parser.add_argument("--tweets-per-news", type=int, default=50, help="Number of tweets paired with each news")
+    parser.add_argument("--seed", type=int, default=9, help="Random seed")
+
+
+def difflib_longest_common_substring(m, n):
+    seq_matcher = SequenceMatcher(None, m, n)
+    match = seq_matcher.find_longest_match(0, len(m), 0, len(n))
+    if match.size != 0:
+        return m[match.a: match.a + match.size]
+    return ""
+
+
+def difflib_clean_stance_target(target, source):
+    while True:
+        common_substring = difflib_longest_common_substring(target, source)
+        if len(common_substring) > 0 and len(common_substring) >= len(target) / 3.0:
+            target = target.replace(common_substring, "")
+        else:
+            break
+    return utils.remove_punctuations(target)
+
+
+def random_sentence(rng, num_words):
+    return " ".join(rng.choice(WORDS) for _ in range(num_words))
+
+
+def generate_pairs(num_news, tweets_per_news, seed):
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(num_news):
+        title = random_sentence(rng, rng.randint(6, 14))
+        description = random_sentence(rng, rng.randint(30, 60))
+        for _ in range(tweets_per_news):
+            source = rng.choice([title, description])
+            words = source.split()
+            start = rng.randint(0, len(words) - 1)
+            quoted = " ".join(words[start: start + rng.randint(1, 8)])
+            tweet = "{} {} {}".format(random_sentence(rng, rng.randint(0, 6)), quoted,
+                                      random_sentence(rng, rng.randint(0, 6)))
+            pairs.append((tweet.strip(), source))
+    return pairs
+
+
+def time_cleaner(cleaner, pairs):
+    start = time.perf_counter()
+    results = [cleaner(target, source) for target, source in pairs]
+    return results, time.perf_counter() - start
+
+
+def run(num_news, tweets_per_news, seed):
+    pairs = generate_pairs(num_news, tweets_per_news, seed)
+    difflib_results, difflib_time = time_cleaner(difflib_clean_stance_target, pairs)
+    automaton_results, automaton_time = time_cleaner(utils.clean_stance_target, pairs)
+    assert difflib_results == automaton_results, "Suffix automaton output differs from difflib"
+    print("clean_stance_target on {} pairs".format(len(pairs)))
+    print("\tdifflib:          {:.3f}s".format(difflib_time))
+    print("\tsuffix automaton: {:.3f}s".format(automaton_time))
+    print("\tspeedup:          {:.1f}x".format(difflib_time / automaton_time))
+
+
+if __name__ == "__main__":
+    lcs_parser = argparse.ArgumentParser()
+    add_arguments(lcs_parser)
+    args = lcs_parser.parse_args()
+    run(args.num_news, args.tweets_per_news, args.seed)
@@ -0,0 +1,86 @@
+import argparse
+import string
+import time
+import preprocessor as p
+import utils
+import utils.io as utils_io
+
+
+def add_arguments(parser):
+    parser.add_argument("--corpus-path", type=str, default="benchmarks/fixtures/tweets.txt",
+                        help="Path to a text file with one tweet per line")
+    parser.add_argument("--repeat", type=int, default=100, help="Number of passes over the corpus when timing")
+
+
+def sequential_clean_tweet_text(tweet_text):
+    """Reference copy of clean_tweet_text before it was rewritten as a single pass."""
+    tweet_text = tweet_text.replace("’", "'").replace("…", "...")
+    tweet_parser = p.parse(tweet_text)
+    cleaned_tweet = tweet_text
+    hash_tags = tweet_parser.hashtags
+    if hash_tags is not None:
+        for hash_tag in hash_tags:
+            cleaned_tweet = cleaned_tweet.replace(hash_tag.match,
+                                                  " ".join(utils.WORD_SEGMENTER.split(hash_tag.match[1:])))
+    tweet_urls = tweet_parser.urls
+    if tweet_urls is not None:
+        for url_link in tweet_urls:
+            cleaned_tweet = cleaned_tweet.replace(url_link.match, " url$$ ")
+    tweet_emojis = tweet_parser.emojis
+    if tweet_emojis is not None:
+        for emoji in tweet_emojis:
+            cleaned_tweet = cleaned_tweet.replace(emoji.match, " emoji$$ ")
+    cleaned_tweet = cleaned_tweet.split("via")[0].split("|")[0].split(" - ")[0].split(" – ")[0]
+    cleaned_tweet_tokens = []
+    for word_token in cleaned_tweet.split(" "):
+        word_token = word_token.strip().rstrip()
+        if word_token.endswith("$$") or word_token in utils.COMMON_ENGLISH_WORDS:
+            cleaned_tweet_tokens.append(word_token)
+        elif len(word_token) > 0:
+            split_tokens = [w for w in utils.WORD_SEGMENTER.split(word_token) if w not in string.punctuation]
+            cleaned_tweet_tokens += [token for token in split_tokens if not utils.is_number(token)]
+
+    cleaned_tweet = " ".join(cleaned_tweet_tokens)
+    return cleaned_tweet
+
+
+def check_compatibility(corpus):
+    mismatches = []
+    for tweet in corpus:
+        expected, actual = sequential_clean_tweet_text(tweet), utils.TWEET_REWRITER.clean(tweet)
+        if expected != actual:
+            mismatches.append((tweet, expected, actual))
+    return mismatches
+
+
+def time_cleaner(cleaner, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for tweet in corpus:
+            cleaner(tweet)
+    return time.perf_counter() - start
+
+
+def run(corpus_path, repeat):
+    corpus = utils_io.load_text_as_list(corpus_path)
+    mismatches = check_compatibility(corpus)
+    for tweet, expected, actual in mismatches:
+        print("Mismatch on {!r}\n\texpected {!r}\n\tactual   {!r}".format(tweet, expected, actual))
+    single_pass = sum(utils.TWEET_REWRITER.rewrite(utils.TweetRewriter.normalize(tweet)) is not None
+                      for tweet in corpus)
+    print("{} of {} tweets match, {} cleaned in a single pass".format(len(corpus) - len(mismatches), len(corpus),
+                                                                     single_pass))
+    sequential_time = time_cleaner(sequential_clean_tweet_text, corpus, repeat)
+    rewriter_time = time_cleaner(utils.TWEET_REWRITER.clean, corpus, repeat)
+    print("\tsequential: {:.3f}s".format(sequential_time))
+    print("\trewriter:   {:.3f}s".format(rewriter_time))
+    print("\tspeedup:    {:.1f}x".format(sequential_time / rewriter_time))
+    return len(mismatches) == 0
+
+
+if __name__ == "__main__":
+    compat_parser = argparse.ArgumentParser()
+    add_arguments(compat_parser)
+    args = compat_parser.parse_args()
+    if not run(args.corpus_path, args.repeat):
+        raise SystemExit(1)
@@ -0,0 +1,213 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import datetime
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from benchmarks import generators
+from config import Config
+import utils.io as utils_io
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CONFIG_PATH = os.path.join(REPO_ROOT, "config", "config.json")
+DEFAULT_BASELINE_DIR = os.path.join(REPO_ROOT, "benchmarks", "baselines")
+# number of rows of every generated dataset, relative to the workspace
+GENERATED_ROWS_PATH = "generated_rows.json"
+
+
+def generate_stance_fnc(config, scale):
+    return generators.generate_fnc(config.fnc_root, num_stances=scale)
+
+
+def generate_stance_fnn(config, scale):
+    return generators.generate_annotated_batches(os.path.join("datasets", "fnn"), num_batches=4,
+                                                 rows_per_batch=max(1, scale // 8))
+
+
+def generate_tweet_paraphrase(config, scale):
+    return generators.generate_tweet_paraphrase(config.tweet_paraphrase_root, num_pairs=scale)
+
+
+def generate_mrpc(config, scale):
+    return generators.generate_mrpc(config.mrpc_root, num_pairs=scale)
+
+
+def generate_re17(config, scale):
+    return generators.generate_rumor_eval_17(config.re17_root, num_discourses=max(1, scale // 20),
+                                             replies_per_discourse=19)
+
+
+def generate_re19(config, scale):
+    return generators.generate_rumor_eval_19(config.re19_root, num_discourses=max(1, scale // 20),
+                                             replies_per_discourse=19)
+
+
+def generate_fnn(config, scale):
+    return generators.generate_fnn(config.fnn_root, num_news=max(1, scale // 40), tweets_per_news=20)
+
+
+# pipeline name -> (dataset generator, name of the main.py function that runs the pipeline, its extra args)
+PIPELINES = {
+    "stance_fnc": (generate_stance_fnc, "preprocess_stance_fnc", ()),
+    "fnc_views": (generate_stance_fnc, "load_fnc_views", ()),
+    "stance_fnn": (generate_stance_fnn, "preprocess_stance_fnn", ()),
+    "sentiment_fnn": (generate_stance_fnn, "preprocess_sentiment_fnn", ()),
+    "tweet_paraphrase": (generate_tweet_paraphrase, "preprocess_tweet_paraphrase", ()),
+    "mrpc": (generate_mrpc, "preprocess_mrpc", ()),
+    "re17": (generate_re17, "load_re17", ()),
+    "re19": (generate_re19, "load_re19", ()),
+    "fnn": (generate_fnn, "load_fnn", ("fake",))
+}
+
+
+def add_arguments(parser):
+    parser.register("type", "bool", lambda v: v.lower() == "true")
+    parser.add_argument("--workspace", type=str, default="bench_workspace",
+                        help="Directory where synthetic datasets and pipeline outputs are written")
+    parser.add_argument("--config-path", type=str, default=DEFAULT_CONFIG_PATH, help="Path to config file")
+    parser.add_argument("-p", "--pipelines", type=str, default=",".join(PIPELINES),
+                        help="Comma separated pipelines to benchmark: {}".format("|".join(PIPELINES)))
+    parser.add_argument("--scale", type=int, default=1000, help="Approximate number of input rows per dataset")
+    parser.add_argument("--num-workers", type=int, default=1, help="Number of processes used to clean texts")
+    parser.add_argument("--skip-generation", type="bool", default=False,
+                        help="Whether to reuse the datasets already in the workspace")
+    parser.add_argument("--baseline-dir", type=str, default=DEFAULT_BASELINE_DIR,
+                        help="Directory of json baselines")
+    parser.add_argument("--save-baseline", type=str, default="", help="Name of the baseline to save results as")
+    parser.add_argument("--compare-baseline", type=str, default="", help="Name of the baseline to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative slowdown or memory growth reported as a regression")
+
+
+def record_generated_rows(generator, num_rows):
+    """Keep the number of rows `generator` made in the current workspace, for runs that skip the generation."""
+    generated_rows = utils_io.read_json(GENERATED_ROWS_PATH) if os.path.isfile(GENERATED_ROWS_PATH) else {}
+    generated_rows[generator.__name__] = num_rows
+    with open(GENERATED_ROWS_PATH, "w", encoding="utf-8") as f:
+        json.dump(generated_rows, f, indent=2)
+
+
+def read_generated_rows(generator):
+    generated_rows = utils_io.read_json(GENERATED_ROWS_PATH) if os.path.isfile(GENERATED_ROWS_PATH) else {}
+    if generator.__name__ not in generated_rows:
+        raise ValueError("No dataset generated by {} in the workspace, run without --skip-generation first"
+                         .format(generator.__name__))
+    return generated_rows[generator.__name__]
+
+
+def peak_rss_mb():
+    """Peak RSS of this process or of the largest of its finished child processes, such as pool workers."""
+    max_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return max_rss / (1024.0 * 1024.0) if sys.platform == "darwin" else max_rss / 1024.0
+
+
+def run_stage(workspace, config_path, function_name, function_args, num_workers):
+    """Run one main.py pipeline inside `workspace`, meant to be called in a fresh process."""
+    os.chdir(workspace)
+    sys.path.insert(0, REPO_ROOT)
+    import main
+    import utils
+
+    utils.configure_clean_cache(None)
+    utils.configure_clean_workers(num_workers)
+    config = Config(utils.read_json(config_path))
+    start = time.perf_counter()
+    getattr(main, function_name)(config, *function_args)
+    wall_time = time.perf_counter() - start
+    utils.shutdown_clean_executor()
+    return wall_time, peak_rss_mb()
+
+
+def benchmark_pipeline(pipeline, workspace, config_path, scale, num_workers, skip_generation):
+    generator, function_name, function_args = PIPELINES[pipeline]
+    config = Config(utils_io.read_json(config_path))
+    cwd = os.getcwd()
+    os.chdir(workspace)
+    try:
+        generation_start = time.perf_counter()
+        generators.generate_vocabulary(os.path.join("datasets", "common_20k.txt"))
+        if skip_generation:
+            num_rows = read_generated_rows(generator)
+        else:
+            num_rows = generator(config, scale)
+            record_generated_rows(generator, num_rows)
+        generation_time = time.perf_counter() - generation_start
+    finally:
+        os.chdir(cwd)
+    print("Generated {} rows for {} in {:.2f}s".format(num_rows, pipeline, generation_time))
+
+    # a spawned process starts from a clean interpreter so that its peak RSS only covers the pipeline,
+    # unlike Pool workers it is not daemonic so pipelines can start their own process pools
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        wall_time, peak_rss = executor.submit(run_stage, os.path.abspath(workspace), os.path.abspath(config_path),
+                                              function_name, function_args, num_workers).result()
+    result = {
+        "rows": num_rows,
+        "wall_time": wall_time,
+        "rows_per_sec": num_rows / wall_time if wall_time > 0 else 0.0,
+        "peak_rss_mb": peak_rss
+    }
+    print("{}: {rows} rows in {wall_time:.2f}s, {rows_per_sec:.1f} rows/sec, peak RSS {peak_rss_mb:.1f}MB"
+          .format(pipeline, **result))
+    return result
+
+
+def save_baseline(results, baseline_dir, name, scale, num_workers):
+    path = os.path.join(baseline_dir, "{}.json".format(name))
+    with open(utils_io.ensure_path(path), "w", encoding="utf-8") as f:
+        json.dump({
+            "created": datetime.datetime.now().isoformat(),
+            "scale": scale,
+            "num_workers": num_workers,
+            "python": sys.version.split()[0],
+            "results": results
+        }, f, indent=2)
+    print("Saved baseline to {}".format(path))
+
+
+def compare_baseline(results, baseline_dir, name, tolerance):
+    baseline = utils_io.read_json(os.path.join(baseline_dir, "{}.json".format(name)))
+    regressions = []
+    for pipeline, result in results.items():
+        if pipeline not in baseline["results"]:
+            print("{}: not in baseline {}".format(pipeline, name))
+            continue
+        baseline_result = baseline["results"][pipeline]
+        throughput_ratio = result["rows_per_sec"] / baseline_result["rows_per_sec"] \
+            if baseline_result["rows_per_sec"] > 0 else 1.0
+        memory_ratio = result["peak_rss_mb"] / baseline_result["peak_rss_mb"] \
+            if baseline_result["peak_rss_mb"] > 0 else 1.0
+        print("{}: throughput x{:.2f}, peak RSS x{:.2f} against {}".format(pipeline, throughput_ratio,
+                                                                         memory_ratio, name))
+        if throughput_ratio < 1.0 - tolerance or memory_ratio > 1.0 + tolerance:
+            regressions.append(pipeline)
+    if len(regressions) > 0:
+        print("Regressions in {}".format(", ".join(regressions)))
+    return regressions
+
+
+def run(args):
+    os.makedirs(args.workspace, exist_ok=True)
+    results = {}
+    for pipeline in args.pipelines.split(","):
+        if pipeline not in PIPELINES:
+            raise ValueError("Unrecognized pipeline {}".format(pipeline))
+        results[pipeline] = benchmark_pipeline(pipeline, args.workspace, args.config_path, args.scale,
+                                               args.num_workers, args.skip_generation)
+    if len(args.save_baseline) > 0:
+        save_baseline(results, args.baseline_dir, args.save_baseline, args.scale, args.num_workers)
+    if len(args.compare_baseline) > 0:
+        return compare_baseline(results, args.baseline_dir, args.compare_baseline, args.tolerance)
+    return []
+
+
+if __name__ == "__main__":
+    bench_parser = argparse.ArgumentParser()
+    add_arguments(bench_parser)
+    if len(run(bench_parser.parse_args())) > 0:
+        raise SystemExit(1)
@@ -1,10 +1,20 @@
 import argparse
 from config import Config
+import itertools
 import ntpath
 from preprocessing import *
 import utils
 
 CONFIGS = None
+FNN_READ_THREADS = 8
+
+# cross eval export name -> (loader deciding the label mapping, whether bodies are split in paragraphs)
+FNC_VIEWS = {
+    "fnc_full": (FncLoader, False),
+    "fnc_relation_full": (FncRelationLoader, False),
+    "fnc_split": (FncLoader, True),
+    "fnc_relation_split": (FncRelationLoader, True)
+}
 
 
 def add_arguments(parser):
@@ -17,53 +27,137 @@ def add_arguments(parser):
     parser.add_argument("--rescaling", type=bool, default=False, help="Whether to rescale the data "
                                                                       "by some distribution")
     parser.add_argument("--rescaling-path", type=str, default="", help="path to file to be rescaled")
+    parser.add_argument("--clean-cache-path", type=str, default="datasets/cache/clean_tweet_text.sqlite",
+                        help="Path to the persistent cache of cleaned texts, empty to keep it in memory only")
+    parser.add_argument("--num-workers", type=int, default=os.cpu_count(),
+                        help="Number of processes used to clean texts and write cross eval folds")
+    parser.add_argument("--segmentation-path", type=str, default="",
+                        help="Path to precomputed word segmentations to load before cleaning")
+    parser.add_argument("--precompute-segmentations", type=str, default="",
+                        help="Dataset whose hashtag segmentations are saved to --segmentation-path: fnn|re17|re19")
+    parser.add_argument("--profile-cleaning", type="bool", default=False,
+                        help="Whether to print a per-stage timing report of text cleaning at the end of the run")
+    parser.add_argument("--profile-cleaning-path", type=str, default="",
+                        help="Path to dump the text cleaning timing report as json")
+    parser.add_argument("--fnc-views", type=str, default=",".join(FNC_VIEWS),
+                        help="Comma separated fnc cross eval exports written by -d fnc_views: {}"
+                        .format("|".join(FNC_VIEWS)))
+    parser.add_argument("--pack-dataset", type=str, default="",
+                        help="Dataset tree to pack into a single store read by --use-packed-store: fnn|re17|re19")
+    parser.add_argument("--use-packed-store", type="bool", default=False,
+                        help="Whether loaders read tweets from the packed store of their dataset")
+    parser.add_argument("--fold-manifest", type="bool", default=False,
+                        help="Whether to write cross eval folds as one data file and per fold row indices")
+    parser.add_argument("--stage-format", type=str, default="tsv",
+                        help="Format of the datasets passed between stance preprocessing stages: tsv|binary")
+    parser.add_argument("--materialize-folds", type=str, default="",
+                        help="Path to a fold manifest whose fold files are written out")
+    parser.add_argument("--compile-vocabulary", type="bool", default=False, help="Whether to precompile the common "
+                                                                                  "english words index")
+
+
+def load_fnc_views(config, views=tuple(FNC_VIEWS)):
+    """Parse FNC once and write the cross eval exports of every view in `views`."""
+    for view in views:
+        if view not in FNC_VIEWS:
+            raise ValueError("Unrecognized fnc view {}".format(view))
+    raw = FncLoader(config.fnc_root).load_raw()
+    for view in views:
+        loader_class, split = FNC_VIEWS[view]
+        dataset = loader_class(config.fnc_root).load_interned(split, raw)
+        dataset.export_cross_eval(os.path.join(config.fnc_root, view), config.num_folds, utils.nlp.CLEAN_WORKERS,
+                                  use_fold_manifest())
 
 
 def load_fnc_full(config):
-    fnc_loader = FncLoader(config.fnc_root)
-    fnc_dataset = fnc_loader.load()
-    fnc_dataset.export_cross_eval(os.path.join(config.fnc_root, "fnc_full"), config.num_folds)
+    load_fnc_views(config, ["fnc_full"])
 
 
 def load_fnc_relation_full(config):
-    fnc_relation_leader = FncRelationLoader(config.fnc_root)
-    fnc_relation_dataset = fnc_relation_leader.load()
-    fnc_relation_dataset.export_cross_eval(os.path.join(config.fnc_root, "fnc_relation_full"), config.num_folds)
+    load_fnc_views(config, ["fnc_relation_full"])
 
 
 def load_fnc_relation_split(config):
-    fnc_relation_leader = FncRelationLoader(config.fnc_root)
-    fnc_relation_dataset = fnc_relation_leader.load_split()
-    fnc_relation_dataset.export_cross_eval(os.path.join(config.fnc_root, "fnc_relation_split"), config.num_folds)
+    load_fnc_views(config, ["fnc_relation_split"])
 
 
 def load_fnc_split(config):
-    fnc_loader = FncLoader(config.fnc_root)
-    fnc_dataset_split = fnc_loader.load_split()
-    fnc_dataset_split.export_cross_eval(os.path.join(config.fnc_root, "fnc_split"), config.num_folds)
+    load_fnc_views(config, ["fnc_split"])
+
+
+def dataset_tree(root):
+    """Packed store of the dataset at `root` if --use-packed-store is set, the filesystem otherwise."""
+    if CONFIGS is not None and CONFIGS.use_packed_store:
+        return PackedTree(PackedTree.default_path(root), root)
+    return FILE_TREE
+
+
+def use_fold_manifest():
+    """Whether cross eval folds are written as a FoldManifest, materialized with --materialize-folds."""
+    return CONFIGS is not None and CONFIGS.fold_manifest
+
+
+def stage_format():
+    """Format of the intermediate stance datasets, binary ones are memory mapped instead of parsed as TSV."""
+    return CONFIGS.stage_format if CONFIGS is not None else "tsv"
+
+
+def pack_dataset(config, dataset_name):
+    if dataset_name == "fnn":
+        root, subtrees = config.fnn_root, FakeNewsNetDatasetLoader.DATASETS
+    elif dataset_name == "re17":
+        root, subtrees = config.re17_root, [os.path.relpath(RumorEval17(config.re17_root).re_data, config.re17_root)]
+    elif dataset_name == "re19":
+        root = config.re19_root
+        subtrees = [os.path.relpath(RumorEvalTwitter19(root).re_data, root)]
+    else:
+        raise ValueError("Unsupported packing for dataset {}".format(dataset_name))
+    num_entries = PackedTree.pack(root, subtrees)
+    print("Packed {} entries of {} to {}".format(num_entries, dataset_name, PackedTree.default_path(root)))
+
+
+def precompute_segmentations(config, dataset_name, path):
+    """Segment the hashtags of every text of a dataset and save them to `path`, loaded with --segmentation-path."""
+    if len(path) == 0:
+        raise ValueError("Precomputing segmentations requires a --segmentation-path to save them to")
+    if dataset_name == "fnn":
+        fnn_loader = FakeNewsNetDatasetLoader(config.fnn_root, tree=dataset_tree(config.fnn_root))
+        texts = itertools.chain(fnn_loader.iter_texts("fake"), fnn_loader.iter_texts("real"))
+    elif dataset_name == "re17":
+        texts = RumorEval17(config.re17_root, tree=dataset_tree(config.re17_root)).iter_texts()
+    elif dataset_name == "re19":
+        texts = RumorEvalTwitter19(config.re19_root, tree=dataset_tree(config.re19_root)).iter_texts()
+    else:
+        raise ValueError("Unsupported segmentation precomputing for dataset {}".format(dataset_name))
+    num_segmentations = utils.WORD_SEGMENTER.precompute_hashtags(texts)
+    utils.WORD_SEGMENTER.save(path)
+    print("Saved {} precomputed segmentations of {} to {}".format(num_segmentations, dataset_name, path))
 
 
 def load_re17(config):
-    re17_loader = RumorEval17(config.re17_root)
-    re17_dataset = re17_loader.load()
-    re17_dataset.export_cross_eval(config.re17_root, config.num_folds)
+    re17_loader = RumorEval17(config.re17_root, num_workers=utils.nlp.CLEAN_WORKERS,
+                              tree=dataset_tree(config.re17_root))
+    re17_dataset = re17_loader.load(compact=True)
+    re17_dataset.export_cross_eval(config.re17_root, config.num_folds, utils.nlp.CLEAN_WORKERS, use_fold_manifest())
 
 
 def load_re19(config):
-    re19_loader = RumorEvalTwitter19(config.re19_root)
-    re19_dataset = re19_loader.load()
+    re19_loader = RumorEvalTwitter19(config.re19_root, num_workers=utils.nlp.CLEAN_WORKERS,
+                                     tree=dataset_tree(config.re19_root))
+    re19_dataset = re19_loader.load(compact=True)
     # re19_dataset.export_full(os.path.join(config.re19_root, "re19.csv"))
-    re19_dataset.export_cross_eval(os.path.join(config.re19_root, "only_twitter"), config.num_folds)
+    re19_dataset.export_cross_eval(os.path.join(config.re19_root, "only_twitter"), config.num_folds,
+                                   utils.nlp.CLEAN_WORKERS, use_fold_manifest())
     # re19_reddit_loader = RumorEvalReddit19(config.re19_root)
     # re19_reddit_dataset = re19_reddit_loader.load()
     # re19_reddit_dataset.export_full(os.path.join(config.re19_root, "re19_reddit.csv"))
 
 
 def load_fnn(config, news_label):
-    fnn_loader = FakeNewsNetDatasetLoader(config.fnn_root)
-    fnn_dataset = fnn_loader.load(clean=False, news_label=news_label)
+    fnn_loader = FakeNewsNetDatasetLoader(config.fnn_root, num_workers=utils.nlp.CLEAN_WORKERS,
+                                          num_threads=FNN_READ_THREADS, tree=dataset_tree(config.fnn_root))
+    fnn_dataset, fnn_dataset_cleaned = fnn_loader.load_both(news_label=news_label)
     fnn_dataset.export_full(os.path.join(config.fnn_root, "fnn_{}_uncleaned.csv".format(news_label)))
-    fnn_dataset_cleaned = fnn_loader.load(clean=True, news_label=news_label)
     fnn_dataset_cleaned.export_full(os.path.join(config.fnn_root, "fnn_{}_cleaned.csv".format(news_label)))
 
 
@@ -75,7 +169,8 @@ def combine_stance_relation_all():
 
 
 def analyse_fnn(config):
-    fnn_loader = FakeNewsNetDatasetLoader(config.fnn_root)
+    fnn_loader = FakeNewsNetDatasetLoader(config.fnn_root, num_workers=utils.nlp.CLEAN_WORKERS,
+                                          tree=dataset_tree(config.fnn_root))
     fnn_loader.export_mentioned_urls(os.path.join(config.fnn_root, "mentioned_urls.csv"),
                                      os.path.join(config.fnn_root, "mentioned_urls_freq.csv"))
     # fnn_loader.export_source_urls_analysis(os.path.join(config.fnn_root, "source_urls.csv"))
@@ -93,31 +188,37 @@ def preprocess_tweet_paraphrase(config):
         = process_text_classification(output_path, os.path.dirname(output_path),
                                       dataset_name="paraphrase")
     cross_val(tweet_paraphrase_train_path, os.path.dirname(tweet_paraphrase_train_path), num_folds=10,
-              dataset_name="paraphrase")
+              dataset_name="paraphrase", manifest=use_fold_manifest())
 
 
 def preprocess_stance_fnc(config):
     fnc_loader = FncLoader(config.fnc_root)
     fnc_dataset = fnc_loader.load()
-    fnc_path = os.path.join(config.fnc_root, "data.tsv")
-    fnc_dataset.export_full(fnc_path, delimiter="\t")
+    if stage_format() == "binary":
+        fnc_path = os.path.join(config.fnc_root, "data.dataset")
+        fnc_dataset.export_binary(fnc_path)
+    else:
+        fnc_path = os.path.join(config.fnc_root, "data.tsv")
+        fnc_dataset.export_full(fnc_path, delimiter="\t")
     fnc_train_path, fnc_test_path = \
-        process_text_classification(fnc_path, os.path.dirname(fnc_path), dataset_name="fnc")
-    cross_val(fnc_train_path, os.path.dirname(fnc_train_path), num_folds=10, dataset_name="fnc")
+        process_text_classification(fnc_path, os.path.dirname(fnc_path), dataset_name="fnc",
+                                    output_format=stage_format())
+    cross_val(fnc_train_path, os.path.dirname(fnc_train_path), num_folds=10, dataset_name="fnc",
+              manifest=use_fold_manifest())
 
 
 def preprocess_stance_fnn(config):
     cleaned_output_path, uncleaned_output_path = process_annotated_datasets(config, label_type="stance")
     cleaned_train_path, cleaned_test_path = \
         process_text_classification(cleaned_output_path, os.path.dirname(cleaned_output_path),
-                                    dataset_name="stance")
+                                    dataset_name="stance", output_format=stage_format())
     uncleaned_train_path, uncleaned_test_path = \
         process_text_classification(uncleaned_output_path, os.path.dirname(uncleaned_output_path),
-                                    dataset_name="stance")
+                                    dataset_name="stance", output_format=stage_format())
     cross_val(cleaned_train_path, os.path.dirname(cleaned_train_path), num_folds=10,
-              dataset_name="stance")
+              dataset_name="stance", manifest=use_fold_manifest())
     cross_val(uncleaned_train_path, os.path.dirname(uncleaned_train_path), num_folds=10,
-              dataset_name="stance")
+              dataset_name="stance", manifest=use_fold_manifest())
 
 
 def preprocess_sentiment_fnn(config):
@@ -129,8 +230,10 @@ def preprocess_sentiment_fnn(config):
     uncleaned_train_path, uncleaned_test_path = \
         process_text_classification(uncleaned_output_path, os.path.dirname(uncleaned_output_path),
                                     label_type="sentiment", dataset_name="sentiment")
-    cross_val(cleaned_train_path, os.path.dirname(cleaned_train_path), num_folds=10, dataset_name="sentiment")
-    cross_val(uncleaned_train_path, os.path.dirname(uncleaned_train_path), num_folds=10, dataset_name="sentiment")
+    cross_val(cleaned_train_path, os.path.dirname(cleaned_train_path), num_folds=10, dataset_name="sentiment",
+              manifest=use_fold_manifest())
+    cross_val(uncleaned_train_path, os.path.dirname(uncleaned_train_path), num_folds=10, dataset_name="sentiment",
+              manifest=use_fold_manifest())
 
 
 def preprocess_mrpc(config):
@@ -148,6 +251,8 @@ def preprocess(dataset_name, config):
         preprocess_sentiment_fnn(config)
     elif dataset_name == "mrpc":
         preprocess_mrpc(config)
+    elif dataset_name == "fnc_views":
+        load_fnc_views(config, CONFIGS.fnc_views.split(","))
     else:
         raise ValueError("Unrecognized dataset {}".format(dataset_name))
 
@@ -224,7 +329,23 @@ if __name__ == "__main__":
     CONFIGS, unparsed = sd_parser.parse_known_args()
     config_json = utils.read_json(CONFIGS.config_path)
     sd_config = Config(config_json)
-    if CONFIGS.to_glue:
+    utils.configure_clean_cache(CONFIGS.clean_cache_path if len(CONFIGS.clean_cache_path) > 0 else None)
+    utils.configure_clean_workers(CONFIGS.num_workers)
+    utils.enable_cleaning_stats(CONFIGS.profile_cleaning or len(CONFIGS.profile_cleaning_path) > 0)
+    precomputing_segmentations = len(CONFIGS.precompute_segmentations) > 0
+    # a table being precomputed is extended if it exists already
+    if len(CONFIGS.segmentation_path) > 0 \
+            and (not precomputing_segmentations or os.path.isfile(CONFIGS.segmentation_path)):
+        print("Loaded {} precomputed segmentations".format(utils.WORD_SEGMENTER.load(CONFIGS.segmentation_path)))
+    if CONFIGS.compile_vocabulary:
+        print("Compiled vocabulary index to {}".format(utils.COMMON_ENGLISH_WORDS.compile()))
+    elif len(CONFIGS.materialize_folds) > 0:
+        FoldManifest(CONFIGS.materialize_folds).materialize()
+    elif precomputing_segmentations:
+        precompute_segmentations(sd_config, CONFIGS.precompute_segmentations, CONFIGS.segmentation_path)
+    elif len(CONFIGS.pack_dataset) > 0:
+        pack_dataset(sd_config, CONFIGS.pack_dataset)
+    elif CONFIGS.to_glue:
         if CONFIGS.dataset_name == "sentiment_fnn":
             convert_to_sst_format(CONFIGS.to_glue_path)
         else:
@@ -236,5 +357,11 @@ if __name__ == "__main__":
             raise ValueError("Unsupported rescaling for dataset {}".format(CONFIGS.dataset_name))
     else:
         preprocess(CONFIGS.dataset_name, sd_config)
+    if CONFIGS.profile_cleaning:
+        print(utils.CLEANING_STATS.report())
+        print("Clean cache {}".format(utils.CLEAN_CACHE.stats()))
+        print("Word segmenter {}".format(utils.WORD_SEGMENTER.stats()))
+    if len(CONFIGS.profile_cleaning_path) > 0:
+        utils.CLEANING_STATS.to_json(CONFIGS.profile_cleaning_path)
     # experiment_summary(sd_config)
     # analyse(sd_config)
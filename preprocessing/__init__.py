@@ -2,5 +2,7 @@ from preprocessing.misc_processing import *
 from preprocessing.evaluator import *
 from preprocessing.dataset_loader import *
 from preprocessing.dataset import *
+from preprocessing.fold_manifest import *
+from preprocessing.packed_tree import *
 from preprocessing.tweet_paraphrase import *
 from preprocessing.mrpc import *
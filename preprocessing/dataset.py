@@ -1,20 +1,231 @@
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+import json
+import mmap
+import multiprocessing
 import numpy as np
 import os
+from preprocessing.fold_manifest import FoldManifest, encode_csv_rows
 from sklearn.model_selection import KFold
 import utils
 
 HEADER = ["index", "source", "target", "stance"]
 STS_HEADER = ["index", "genre", "filename", "year", "old_index", "source1", "source2", "sentence1",
               "sentence2", "stance"]
+INT32_MAX = 2 ** 31 - 1
+BINARY_MAGIC = b"TPDSET01"
+# sections of the binary format are aligned for the widest dtype they hold
+BINARY_ALIGNMENT = 8
+
+
+class InternedFeatureSet(object):
+    """Sequence of [source, target] features whose sources are stored once in a shared table.
+
+    `rows` holds (table_idx, target) pairs, the source text of a row is only looked up when the row is read.
+    """
+
+    def __init__(self, table, rows):
+        self.table = table
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return InternedFeatureSet(self.table, self.rows[i])
+        table_idx, target = self.rows[i]
+        return [self.table[table_idx], target]
+
+    def __iter__(self):
+        for table_idx, target in self.rows:
+            yield [self.table[table_idx], target]
+
+
+class StringPool(object):
+    """Unique strings stored once in a single UTF-8 buffer, string i spans offsets[i]:offsets[i + 1].
+
+    Offsets are int32, so a pool holds at most 2GB of encoded text.
+    """
+    __slots__ = ("buffer", "offsets", "ids")
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offsets = array("i", [0])
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, string_id):
+        return str(memoryview(self.buffer)[self.offsets[string_id]: self.offsets[string_id + 1]], "utf-8")
+
+    def add(self, text):
+        """Id of `text`, appended to the pool unless an equal string is already in it."""
+        if self.ids is None:
+            self.ids = {self[string_id]: string_id for string_id in range(len(self))}
+        string_id = self.ids.get(text)
+        if string_id is None:
+            encoded = text.encode("utf-8")
+            if len(self.buffer) + len(encoded) > INT32_MAX:
+                raise OverflowError("String pool is limited to {} bytes".format(INT32_MAX))
+            self.buffer += encoded
+            self.offsets.append(len(self.buffer))
+            string_id = len(self.offsets) - 2
+            self.ids[text] = string_id
+        return string_id
+
+    def freeze(self):
+        """Drop the lookup table of the strings, it is rebuilt if more strings are added."""
+        self.ids = None
+
+    @classmethod
+    def from_buffers(cls, buffer, offsets):
+        """Read only pool over an existing UTF-8 `buffer` and its int32 `offsets`, neither is copied."""
+        pool = cls.__new__(cls)
+        pool.buffer = buffer
+        pool.offsets = offsets
+        pool.ids = None
+        return pool
+
+
+class PooledStrings(object):
+    """Read only sequence of the strings of a StringPool whose ids are given by `ids`."""
+    __slots__ = ("pool", "ids")
+
+    def __init__(self, pool, ids):
+        self.pool = pool
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        return self.pool[self.ids[i]]
+
+    def __iter__(self):
+        for string_id in self.ids:
+            yield self.pool[string_id]
+
+
+class CompactFeatureSet(object):
+    """Sequence of [source, target] features stored as int32 ids into a StringPool."""
+    __slots__ = ("pool", "sources", "targets")
+
+    def __init__(self, pool=None):
+        self.pool = pool if pool is not None else StringPool()
+        self.sources = array("i")
+        self.targets = array("i")
+
+    def __len__(self):
+        return len(self.sources)
+
+    def __getitem__(self, i):
+        return [self.pool[self.sources[i]], self.pool[self.targets[i]]]
+
+    def __iter__(self):
+        for i in range(len(self.sources)):
+            yield self[i]
+
+    def append(self, feature):
+        source, target = feature
+        self.sources.append(self.pool.add(source))
+        self.targets.append(self.pool.add(target))
+
+    @classmethod
+    def from_buffers(cls, pool, sources, targets):
+        """Read only feature set over existing `sources` and `targets` id arrays, neither is copied."""
+        feature_set = cls.__new__(cls)
+        feature_set.pool = pool
+        feature_set.sources = sources
+        feature_set.targets = targets
+        return feature_set
+
+
+class CompactLabelSet(object):
+    """Sequence of labels stored as uint8 codes into a label vocabulary, `codes` views them as a NumPy array."""
+    __slots__ = ("vocabulary", "label_codes", "_codes")
+
+    def __init__(self, vocabulary=()):
+        self.vocabulary = list(vocabulary)
+        self.label_codes = {label: code for code, label in enumerate(self.vocabulary)}
+        self._codes = array("B")
+
+    @property
+    def codes(self):
+        return np.frombuffer(self._codes, dtype=np.uint8) if len(self._codes) > 0 else np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self._codes)
+
+    def __getitem__(self, i):
+        return self.vocabulary[self._codes[i]]
+
+    def __iter__(self):
+        for code in self._codes:
+            yield self.vocabulary[code]
+
+    def append(self, label):
+        code = self.label_codes.get(label)
+        if code is None:
+            if len(self.vocabulary) > 255:
+                raise OverflowError("Label vocabulary is limited to 256 labels")
+            code = len(self.vocabulary)
+            self.vocabulary.append(label)
+            self.label_codes[label] = code
+        self._codes.append(code)
+
+    @classmethod
+    def from_buffers(cls, vocabulary, codes):
+        """Read only label set over an existing uint8 `codes` array, it is not copied."""
+        label_set = cls(vocabulary)
+        label_set._codes = codes
+        return label_set
+
+
+VALIDATION_MODES = ["eager", "lazy", "off"]
+# dataset whose folds are being exported, forked fold writers inherit it instead of receiving a pickled copy
+_CROSS_EVAL_DATASET = None
+
+
+def feature_column_types(feature_set):
+    """Distinct types of the sources and targets of a feature set, checking every feature is a pair."""
+    if isinstance(feature_set, CompactFeatureSet):
+        # pooled strings are encoded from str when added
+        return {str}
+    if isinstance(feature_set, InternedFeatureSet):
+        assert all(len(row) == 2 for row in feature_set.rows)
+        return set(map(type, feature_set.table)) | {type(target) for _, target in feature_set.rows}
+    assert set(map(len, feature_set)) <= {2}
+    return set(map(type, chain.from_iterable(feature_set)))
+
+
+def distinct_labels(label_set):
+    if isinstance(label_set, CompactLabelSet):
+        return set(label_set.vocabulary)
+    return set(label_set)
 
 
 class BaseDataset(object):
-    def __init__(self, feature_set, label_set, idxs=None):
+    # allowed labels, any string if None
+    LABELS = None
+
+    def __init__(self, feature_set, label_set, idxs=None, validate="eager"):
+        """`validate` checks the dataset on construction if "eager", before its first export if "lazy", never if
+        "off" for trusted pipelines whose records are already validated."""
+        assert validate in VALIDATION_MODES
         self.feature_set = feature_set
         self.label_set = label_set
         self.idxs = idxs
         self.size = len(feature_set)
-        self.validate()
+        self.validated = validate == "off"
+        if validate == "eager":
+            self.validate()
+
+    def __len__(self):
+        return self.size
 
     @staticmethod
     def combine(ds1, ds2):
@@ -22,72 +233,250 @@ class BaseDataset(object):
         label_set = ds1.feature_set + ds2.feature_set
         return BaseDataset(feature_set, label_set)
 
+    @classmethod
+    def from_records(cls, records, compact=False, validate="eager"):
+        """Dataset holding (idx, source, target, label) records, idxs are only kept if they are not 0, 1, 2...
+
+        With `compact` the texts are stored once in a string pool and the labels as small int codes.
+        """
+        if compact:
+            feature_set, label_set, idxs = CompactFeatureSet(), CompactLabelSet(), array("q")
+        else:
+            feature_set, label_set, idxs = [], [], []
+        for idx, source, target, label in records:
+            feature_set.append([source, target])
+            label_set.append(label)
+            idxs.append(idx)
+        if compact:
+            feature_set.pool.freeze()
+        dataset = cls(feature_set, label_set, validate=validate)
+        if any(idx != i for i, idx in enumerate(idxs)):
+            dataset.idxs = idxs
+        return dataset
+
+    def to_compact(self):
+        """Same dataset stored in a CompactFeatureSet and a CompactLabelSet."""
+        return self.from_records(self.iter_records(), compact=True)
+
     def validate(self):
+        """Check whole columns at once: feature pairs and types in one pass, labels through their distinct set."""
         assert len(self.feature_set) == len(self.label_set)
-        for i in range(self.size):
-            assert len(self.feature_set[i]) == 2
-            assert type(self.feature_set[i][0]) == str
-            assert type(self.feature_set[i][1]) == str
-            assert type(self.label_set[i]) == str
-            self.validate_labels(self.label_set[i])
+        feature_types = feature_column_types(self.feature_set)
+        assert feature_types <= {str}, "Features must be strings, found {}".format(feature_types)
+        labels = distinct_labels(self.label_set)
+        assert all(type(label) == str for label in labels), "Labels must be strings"
+        if self.LABELS is not None:
+            assert labels <= self.LABELS, "Unsupported labels {}".format(sorted(labels - self.LABELS))
+        self.validated = True
 
-    @staticmethod
-    def validate_labels(label):
+    def ensure_validated(self):
+        if not self.validated:
+            self.validate()
+
+    @classmethod
+    def validate_record(cls, source, target, label):
+        assert type(source) == str
+        assert type(target) == str
         assert type(label) == str
+        cls.validate_labels(label)
 
-    def export_cross_eval(self, output_dir, num_folds=10):
+    @classmethod
+    def validate_labels(cls, label):
+        assert type(label) == str
+        assert cls.LABELS is None or label in cls.LABELS
+
+    def export_cross_eval(self, output_dir, num_folds=10, num_workers=1, manifest=False):
+        """Write the train.tsv and dev.tsv of every fold, splitting only row numbers so the texts stay in place.
+
+        With `num_workers` > 1 folds are written by forked processes sharing this dataset. With `manifest` the
+        rows are written once in a FoldManifest instead, whose `materialize` writes the same fold files.
+        """
+        global _CROSS_EVAL_DATASET
+        self.ensure_validated()
         kf = KFold(n_splits=num_folds)
-        X, y = np.array(self.feature_set), np.array(self.label_set)
-        indices = np.array(self.idxs) if self.idxs is not None else np.array(range(1, len(self.feature_set)+1))
-        fold = 1
-        for train_index, test_index in kf.split(X):
-            print("Creating fold {} at {}".format(fold, output_dir))
-            X_train, X_test = X[train_index], X[test_index]
-            y_train, y_test = y[train_index], y[test_index]
-            idx_train, idx_test = indices[train_index], indices[test_index]
-            fold_path = os.path.join(output_dir, "fold_{}".format(str(fold)))
-            self.export_full(utils.io.ensure_path(os.path.join(fold_path, "train.tsv")), X_train, y_train,
-                             idx_train, "\t")
-            self.export_full(utils.io.ensure_path(os.path.join(fold_path, "dev.tsv")), X_test, y_test,
-                             idx_test, "\t")
-            fold += 1
-
-    def export_full(self, path, feature_set=None, label_set=None, idxs=None, delimiter=","):
+        folds = [(output_dir, fold, train_index, test_index)
+                 for fold, (train_index, test_index) in enumerate(kf.split(np.arange(self.size)), 1)]
+        if manifest:
+            print("Creating fold manifest at {}".format(output_dir))
+            records = self.iter_records(idxs=self.cross_eval_idxs())
+            FoldManifest.write(output_dir, "cross_eval", encode_csv_rows((list(record) for record in records), "\t"),
+                               [test_index for _, _, _, test_index in folds], ["train.tsv", "dev.tsv"],
+                               header=next(encode_csv_rows([HEADER], "\t")), delimiter="\t")
+            return
+        if num_workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+            for fold_args in folds:
+                self.export_fold(*fold_args)
+            return
+        _CROSS_EVAL_DATASET = self
+        try:
+            with ProcessPoolExecutor(max_workers=min(num_workers, num_folds),
+                                     mp_context=multiprocessing.get_context("fork")) as executor:
+                list(executor.map(export_cross_eval_fold, folds))
+        finally:
+            _CROSS_EVAL_DATASET = None
+
+    def cross_eval_idxs(self):
+        # cross eval rows are numbered from 1 unless the dataset has its own idxs
+        return self.idxs if self.idxs is not None else range(1, self.size + 1)
+
+    def export_fold(self, output_dir, fold, train_index, test_index):
+        print("Creating fold {} at {}".format(fold, output_dir))
+        idxs = self.cross_eval_idxs()
+        fold_path = os.path.join(output_dir, "fold_{}".format(str(fold)))
+        self.export_full(utils.io.ensure_path(os.path.join(fold_path, "train.tsv")), delimiter="\t",
+                         records=self.iter_records(idxs=idxs, rows=train_index))
+        self.export_full(utils.io.ensure_path(os.path.join(fold_path, "dev.tsv")), delimiter="\t",
+                         records=self.iter_records(idxs=idxs, rows=test_index))
+
+    def iter_records(self, feature_set=None, label_set=None, idxs=None, rows=None):
+        """Yield (idx, source, target, label) of every row, or only of the row numbers in `rows`."""
         feature_set = feature_set if feature_set is not None else self.feature_set
         label_set = label_set if label_set is not None else self.label_set
         idxs = idxs if idxs is not None else self.idxs
         assert len(feature_set) == len(label_set)
-        content = []
-        for i in range(len(feature_set)):
-            source, target = feature_set[i][0], feature_set[i][1]
-            stance = label_set[i]
+        for i in (rows if rows is not None else range(len(feature_set))):
             idx = i if idxs is None else idxs[i]
-            content.append([idx, source, target, stance])
+            feature = feature_set[i]
+            yield idx, feature[0], feature[1], label_set[i]
+
+    def export_full(self, path, feature_set=None, label_set=None, idxs=None, delimiter=",", records=None):
+        """Write the dataset, or the given (idx, source, target, label) `records` iterator, row by row."""
+        self.ensure_validated()
+        records = records if records is not None else self.iter_records(feature_set, label_set, idxs)
+        self.write_records(records, path, delimiter)
+
+    def export_sts_format(self, path, records=None):
+        self.ensure_validated()
+        records = records if records is not None else self.iter_records()
+        self.write_sts_records(records, path)
+
+    def export_binary(self, path, rows=None):
+        """Write the dataset, or only the row numbers in `rows`, in the binary format mapped by `load_binary`.
+
+        Texts are stored once in a UTF-8 string pool with int32 offsets, features as int32 ids into it, labels as
+        uint8 codes into their vocabulary and idxs as int64, or as ids into a pool of their own if they are strings.
+        Rows of a dataset without idxs keep their row number as idx when only some of them are written.
+        """
+        self.ensure_validated()
+        all_rows = rows is None
+        rows = np.arange(self.size) if all_rows else np.asarray(rows, dtype=np.int64)
+        if isinstance(self.feature_set, CompactFeatureSet):
+            feature_set = self.feature_set
+            sources = np.asarray(feature_set.sources, dtype=np.int32)[rows]
+            targets = np.asarray(feature_set.targets, dtype=np.int32)[rows]
+        else:
+            feature_set = CompactFeatureSet()
+            for i in rows:
+                feature_set.append(self.feature_set[i])
+            sources = np.asarray(feature_set.sources, dtype=np.int32)
+            targets = np.asarray(feature_set.targets, dtype=np.int32)
+        if isinstance(self.label_set, CompactLabelSet):
+            label_set, labels = self.label_set, self.label_set.codes[rows]
+        else:
+            label_set = CompactLabelSet()
+            for i in rows:
+                label_set.append(self.label_set[i])
+            labels = label_set.codes
+        sections = OrderedDict([
+            ("pool_buffer", np.frombuffer(feature_set.pool.buffer, dtype=np.uint8)),
+            ("pool_offsets", np.asarray(feature_set.pool.offsets, dtype=np.int32)),
+            ("sources", sources),
+            ("targets", targets),
+            ("labels", labels)
+        ])
+        idxs = self.idxs
+        if idxs is None and not all_rows:
+            idxs = rows
+        elif idxs is not None:
+            idxs = [idxs[i] for i in rows]
+        idxs_type = None
+        if idxs is not None and any(isinstance(idx, str) for idx in idxs):
+            idxs_type, idx_pool = "str", StringPool()
+            sections["idx_ids"] = np.array([idx_pool.add(idx) for idx in idxs], dtype=np.int32)
+            sections["idx_pool_buffer"] = np.frombuffer(idx_pool.buffer, dtype=np.uint8)
+            sections["idx_pool_offsets"] = np.asarray(idx_pool.offsets, dtype=np.int32)
+        elif idxs is not None:
+            idxs_type = "int"
+            sections["idxs"] = np.asarray(idxs, dtype=np.int64)
+        self.write_binary(path, {"num_rows": len(rows), "vocabulary": label_set.vocabulary, "idxs": idxs_type},
+                          sections)
+
+    @staticmethod
+    def write_binary(path, header, sections):
+        """Write the magic bytes, the length of the json `header`, the header and the aligned `sections` arrays."""
+        layout, offset = OrderedDict(), 0
+        for name, values in sections.items():
+            layout[name] = [offset, values.dtype.str, len(values)]
+            offset = binary_aligned(offset + values.nbytes)
+        header = json.dumps(dict(header, sections=layout)).encode("utf-8")
+        with open(utils.io.ensure_path(path), "wb") as f:
+            f.write(BINARY_MAGIC)
+            f.write(np.uint64(len(header)).tobytes())
+            f.write(header)
+            f.write(bytes(binary_aligned(f.tell()) - f.tell()))
+            for values in sections.values():
+                f.write(np.ascontiguousarray(values).tobytes())
+                f.write(bytes(binary_aligned(f.tell()) - f.tell()))
+
+    @classmethod
+    def load_binary(cls, path, validate="eager"):
+        """Dataset written by `export_binary`, its columns are read only views of the memory mapped file."""
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if data[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+            raise ValueError("{} is not a binary dataset".format(path))
+        header_start = len(BINARY_MAGIC) + 8
+        header_size = int(np.frombuffer(data, dtype=np.uint64, count=1, offset=len(BINARY_MAGIC))[0])
+        header = json.loads(data[header_start: header_start + header_size].decode("utf-8"))
+        start = binary_aligned(header_start + header_size)
+        sections = {name: np.frombuffer(data, dtype=np.dtype(dtype), count=count, offset=start + offset)
+                    for name, (offset, dtype, count) in header["sections"].items()}
+        pool = StringPool.from_buffers(sections["pool_buffer"], sections["pool_offsets"])
+        feature_set = CompactFeatureSet.from_buffers(pool, sections["sources"], sections["targets"])
+        label_set = CompactLabelSet.from_buffers(header["vocabulary"], sections["labels"])
+        dataset = cls(feature_set, label_set, validate=validate)
+        if header["idxs"] == "int":
+            dataset.idxs = sections["idxs"]
+        elif header["idxs"] == "str":
+            idx_pool = StringPool.from_buffers(sections["idx_pool_buffer"], sections["idx_pool_offsets"])
+            dataset.idxs = PooledStrings(idx_pool, sections["idx_ids"])
+        return dataset
+
+    @staticmethod
+    def is_binary(path):
+        """Whether `path` holds a dataset written by `export_binary`."""
+        with open(path, "rb") as f:
+            return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+    @staticmethod
+    def write_records(records, path, delimiter=","):
+        content = ([idx, source, target, stance] for idx, source, target, stance in records)
         utils.write_csv(content, HEADER, path, delimiter)
 
-    def export_sts_format(self, path):
-        content = []
-        for i in range(self.size):
-            source, target = self.feature_set[i][0], self.feature_set[i][1]
-            stance = self.label_set[i]
-            idx = i if self.idxs is None else self.idxs[i]
-            content.append([idx, "none", "none", "none", "none", "none", "none", source, target, stance])
+    @staticmethod
+    def write_sts_records(records, path):
+        content = ([idx, "none", "none", "none", "none", "none", "none", source, target, stance]
+                   for idx, source, target, stance in records)
         utils.write_csv(content, STS_HEADER, path, delimiter="\t")
 
 
+def binary_aligned(offset):
+    return -(-offset // BINARY_ALIGNMENT) * BINARY_ALIGNMENT
+
+
+def export_cross_eval_fold(fold_args):
+    _CROSS_EVAL_DATASET.export_fold(*fold_args)
+
+
 class RelationDataset(BaseDataset):
-    def __init__(self, feature_set, label_set):
-        super(RelationDataset, self).__init__(feature_set, label_set)
+    LABELS = frozenset(["related", "unrelated"])
 
-    @staticmethod
-    def validate_labels(label):
-        assert label in ["related", "unrelated"]
+    def __init__(self, feature_set, label_set, validate="eager"):
+        super(RelationDataset, self).__init__(feature_set, label_set, validate=validate)
 
 
 class StanceDataset(BaseDataset):
-    def __init__(self, feature_set, label_set, idxs=None):
-        super(StanceDataset, self).__init__(feature_set, label_set, idxs=idxs)
+    LABELS = frozenset(["support", "deny", "comment", "unrelated"])
 
-    @staticmethod
-    def validate_labels(label): 
-        assert label in ["support", "deny", "comment", "unrelated"]
+    def __init__(self, feature_set, label_set, idxs=None, validate="eager"):
+        super(StanceDataset, self).__init__(feature_set, label_set, idxs=idxs, validate=validate)
@@ -1,8 +1,16 @@
-from collections import Counter
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import csv
-import urllib3
+from functools import partial
+import io
+import json
+import multiprocessing
 
 from preprocessing.dataset import *
+from preprocessing.packed_tree import *
+
+# loader and maps of the discourses being built, forked discourse workers inherit them instead of pickled copies
+_DISCOURSE_LOADER = None
 
 
 class BaseDatasetLoader(object):
@@ -13,63 +21,241 @@ class BaseDatasetLoader(object):
     def load(self):
         return StanceDataset([], [])
 
+    def iter_records(self):
+        """(idx, source, target, label) records of the dataset returned by `load`."""
+        return self.load().iter_records()
+
+
+class FakeNewsNetManifest(object):
+    """Persisted index of the tweet files of one Fake News Net label, numbered like the loader numbers tweets.
+
+    Each news is stored as [dataset, news_id, ordinal of its first tweet, tweet files] in listing order, only
+    news with a content file and a tweets directory take ordinals. The manifest is rebuilt whenever the
+    modification time of a label, news or tweets directory differs from the one recorded when it was built.
+    """
+
+    def __init__(self, fnn_root, news_label, news=None, mtimes=None, tree=FILE_TREE):
+        self.fnn_root = fnn_root
+        self.news_label = news_label
+        self.tree = tree
+        self.news = news if news is not None else []
+        self.mtimes = mtimes if mtimes is not None else {}
+
+    @staticmethod
+    def path_for(fnn_root, news_label):
+        return os.path.join(fnn_root, "manifest_{}.json".format(news_label))
+
+    @classmethod
+    def build(cls, fnn_root, datasets, news_label, tree=FILE_TREE):
+        manifest = cls(fnn_root, news_label, tree=tree)
+        ordinal = 0
+        for dataset in datasets:
+            news_label_dir = os.path.join(dataset, news_label)
+            manifest.record_mtime(news_label_dir)
+            for news_id in tree.listdir(os.path.join(fnn_root, news_label_dir)):
+                news_dir = os.path.join(news_label_dir, news_id)
+                manifest.record_mtime(news_dir)
+                tweet_dir = os.path.join(news_dir, "tweets")
+                if not tree.isfile(os.path.join(fnn_root, news_dir, "news content.json")) \
+                        or not tree.isdir(os.path.join(fnn_root, tweet_dir)):
+                    continue
+                manifest.record_mtime(tweet_dir)
+                tweet_files = tree.listdir(os.path.join(fnn_root, tweet_dir))
+                manifest.news.append([dataset, news_id, ordinal, tweet_files])
+                ordinal += len(tweet_files)
+        return manifest
+
+    @classmethod
+    def load(cls, fnn_root, datasets, news_label, tree=FILE_TREE):
+        """Persisted manifest of `news_label`, rebuilt and saved again if it is missing or stale."""
+        path = cls.path_for(fnn_root, news_label)
+        if os.path.isfile(path):
+            content = utils.read_json(path)
+            manifest = cls(fnn_root, news_label, content["news"], content["mtimes"], tree)
+            if content["datasets"] == list(datasets) and not manifest.is_stale():
+                return manifest
+        print("Building Fake News Net manifest {}".format(path))
+        manifest = cls.build(fnn_root, datasets, news_label, tree)
+        manifest.save(datasets)
+        return manifest
+
+    def record_mtime(self, directory):
+        self.mtimes[directory] = self.tree.getmtime(os.path.join(self.fnn_root, directory))
+
+    def is_stale(self):
+        for directory, mtime in self.mtimes.items():
+            path = os.path.join(self.fnn_root, directory)
+            if not self.tree.isdir(path) or self.tree.getmtime(path) != mtime:
+                return True
+        return False
+
+    def save(self, datasets):
+        path = self.path_for(self.fnn_root, self.news_label)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"datasets": list(datasets), "news": self.news, "mtimes": self.mtimes}, f)
+        os.replace(path + ".tmp", path)
+
+    def num_tweets(self):
+        if len(self.news) == 0:
+            return 0
+        _, _, first_ordinal, tweet_files = self.news[-1]
+        return first_ordinal + len(tweet_files)
+
+    def select(self, batch_range):
+        """(news directory, tweet files) of the news with tweets inside `batch_range`, without opening any file.
+
+        Same selection as FakeNewsNetDatasetLoader.select_news_tweets: news starting after the end of the
+        range are dropped and only tweets numbered strictly after its start are kept.
+        """
+        start, end = batch_range
+        for dataset, news_id, first_ordinal, tweet_files in self.news:
+            if first_ordinal > end:
+                return
+            if first_ordinal + len(tweet_files) - 1 <= start:
+                continue
+            selected_tweet_files = tweet_files[max(0, start + 1 - first_ordinal):]
+            yield os.path.join(self.fnn_root, dataset, self.news_label, news_id), selected_tweet_files
+
+
+class NewsUrlAnalysis(object):
+    """Url lists of every news of a Fake News Net label, analysed in parallel and cached per news.
+
+    `news_mtime(news_dir)` is the modification time of the files an analysis reads and `analyse_news(news_dir)`
+    the sorted home urls of a news, None if it has nothing to analyse. Url lists are cached in <fnn_root>/<name>_
+    <news_label>.json and reused while the mtime of their news is unchanged, so only new or updated news are
+    analysed again.
+    """
+
+    def __init__(self, name, news_mtime, analyse_news, num_workers=1, chunk_size=64):
+        self.name = name
+        self.news_mtime = news_mtime
+        self.analyse_news = analyse_news
+        self.num_workers = num_workers
+        self.chunk_size = chunk_size
+
+    def analyse_chunk(self, news_chunk):
+        """(news key, mtime, urls) of a chunk of news and the frequency of every url across the chunk."""
+        results, url_counter = [], Counter()
+        for news_key, news_dir, mtime in news_chunk:
+            urls = self.analyse_news(news_dir)
+            if urls is not None:
+                url_counter.update(urls)
+            results.append((news_key, mtime, urls))
+        return results, url_counter
+
+    def run(self, fnn_root, datasets, news_label, tree=FILE_TREE):
+        """{news key: urls} of every news in listing order and the number of news mentioning every url."""
+        cache_path = os.path.join(fnn_root, "{}_{}.json".format(self.name, news_label))
+        cache = utils.read_json(cache_path) if os.path.isfile(cache_path) else {}
+        news_keys, stale_news, url_counter = [], [], Counter()
+        for dataset in datasets:
+            for news_id in tree.listdir(os.path.join(fnn_root, dataset, news_label)):
+                news_key = "/".join([dataset, news_label, news_id])
+                news_dir = os.path.join(fnn_root, dataset, news_label, news_id)
+                mtime = self.news_mtime(news_dir)
+                news_keys.append(news_key)
+                if news_key in cache and cache[news_key][0] == mtime:
+                    if cache[news_key][1] is not None:
+                        url_counter.update(cache[news_key][1])
+                else:
+                    stale_news.append((news_key, news_dir, mtime))
+        print("Analysing {} of {} news, {} cached".format(self.name, len(stale_news),
+                                                              len(news_keys) - len(stale_news)))
+
+        chunks = [stale_news[i: i + self.chunk_size] for i in range(0, len(stale_news), self.chunk_size)]
+        # like the other loader pools, workers are forked and news are analysed in this process without fork
+        if self.num_workers > 1 and len(chunks) > 1 and "fork" in multiprocessing.get_all_start_methods():
+            with ProcessPoolExecutor(max_workers=self.num_workers,
+                                     mp_context=multiprocessing.get_context("fork")) as executor:
+                chunk_results = list(executor.map(self.analyse_chunk, chunks))
+        else:
+            chunk_results = [self.analyse_chunk(chunk) for chunk in chunks]
+        for results, chunk_url_counter in chunk_results:
+            url_counter += chunk_url_counter
+            for news_key, mtime, urls in results:
+                cache[news_key] = [mtime, urls]
+
+        news_urls = OrderedDict((news_key, cache[news_key][1]) for news_key in news_keys)
+        if len(stale_news) > 0:
+            with open(cache_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({news_key: cache[news_key] for news_key in news_keys}, f)
+            os.replace(cache_path + ".tmp", cache_path)
+        return news_urls, url_counter
+
 
 class FakeNewsNetDatasetLoader(BaseDatasetLoader):
 
     DEFAULT_STANCE = "comment"
     DATASETS = ["politifact"]
+    MENTIONED_URL_FIELDS = ["entities.urls.expanded_url"]
 
-    def __init__(self, fnn_root, info_every=10):
+    def __init__(self, fnn_root, info_every=10, num_workers=1, num_threads=1, use_manifest=True, tree=FILE_TREE):
         super().__init__(info_every)
         self.fnn_root = fnn_root
+        self.tree = tree
+        self.num_workers = num_workers
+        self.num_threads = num_threads
+        self.use_manifest = use_manifest
 
-    def load_mentioned_urls(self, news_label="fake"):
-        mentioned_urls_dict, mentioned_urls_corpus = {}, []
-        print("Load mentioned urls")
-        i = 0
+    @staticmethod
+    def tweets_mtime(news_dir, tree=FILE_TREE):
+        tweet_dir = os.path.join(news_dir, "tweets")
+        return tree.getmtime(tweet_dir) if tree.isdir(tweet_dir) else None
 
-        for dataset in self.DATASETS:
-            dataset_dir = os.path.join(self.fnn_root, dataset)
-            news_label_dir = os.path.join(dataset_dir, news_label)
-            for news_id in os.listdir(news_label_dir):
-                mentioned_urls_dict[news_id] = set()
-                unique_mentioned_urls = set()
-                news_dir = os.path.join(news_label_dir, news_id)
-                tweet_dir = os.path.join(news_dir, "tweets")
-                print(tweet_dir)
-                if not os.path.isdir(tweet_dir):
-                    continue
-                for tweet_id in os.listdir(tweet_dir):
-                    if i % self.info_every == 0:
-                        print("Loaded {} Fake News Net tweets".format(str(i)))
-                    tweet_path = os.path.join(tweet_dir, tweet_id)
-                    tweet_content = utils.read_json(tweet_path)
-                    if "entities" not in tweet_content or "urls" not in tweet_content["entities"] \
-                            or len(tweet_content["entities"]["urls"]) == 0:
-                        continue
-                    for url_obj in tweet_content["entities"]["urls"]:
-                        expanded_url = url_obj["expanded_url"]
-                        if len(expanded_url) > 0:
-                            home_expanded_url = utils.extract_home_url(expanded_url)
-                            mentioned_urls_dict[news_id].add(home_expanded_url)
-                            unique_mentioned_urls.add(home_expanded_url)
-                    i += 1
-                mentioned_urls_corpus += list(unique_mentioned_urls)
+    @staticmethod
+    def news_mentioned_urls(news_dir, tree=FILE_TREE):
+        """Sorted home urls mentioned by the tweets of a news, None if it has no tweets."""
+        tweet_dir = os.path.join(news_dir, "tweets")
+        if not tree.isdir(tweet_dir):
+            return None
+        mentioned_urls = set()
+        for tweet_content in tree.read_jsons(tweet_dir, fields=FakeNewsNetDatasetLoader.MENTIONED_URL_FIELDS):
+            if "entities" not in tweet_content or "urls" not in tweet_content["entities"]:
+                continue
+            for url_obj in tweet_content["entities"]["urls"]:
+                expanded_url = url_obj["expanded_url"]
+                if len(expanded_url) > 0:
+                    mentioned_urls.add(utils.extract_home_url(expanded_url))
+        return sorted(mentioned_urls)
+
+    @staticmethod
+    def news_content_mtime(news_dir, tree=FILE_TREE):
+        news_content_path = os.path.join(news_dir, "news content.json")
+        return tree.getmtime(news_content_path) if tree.isfile(news_content_path) else None
 
+    @staticmethod
+    def news_source_urls(news_dir, tree=FILE_TREE):
+        """Home url of the source of a news as a single element list, None if it has no content."""
+        news_content_path = os.path.join(news_dir, "news content.json")
+        if not tree.isfile(news_content_path):
+            return None
+        return [utils.extract_home_url(tree.read_json(news_content_path, fields=["url"])["url"])]
+
+    def analyse_urls(self, name, news_mtime, analyse_news, news_label="fake"):
+        analysis = NewsUrlAnalysis(name, partial(news_mtime, tree=self.tree), partial(analyse_news, tree=self.tree),
+                                   self.num_workers)
+        return analysis.run(self.fnn_root, self.DATASETS, news_label, self.tree)
+
+    def mentioned_url_counts(self, news_label="fake"):
+        """[news_id, space separated mentioned urls] rows and the number of news mentioning every url."""
+        print("Load mentioned urls")
+        news_urls, url_counter = self.analyse_urls("mentioned_urls", self.tweets_mtime, self.news_mentioned_urls,
+                                                   news_label)
+        mentioned_urls_dict = {}
+        for news_key, urls in news_urls.items():
+            mentioned_urls_dict[os.path.basename(news_key)] = urls if urls is not None else []
         mentioned_urls = [[k, " ".join(v)] for k, v in mentioned_urls_dict.items()]
         print("Size of mentioned urls " + str(len(mentioned_urls)))
-        return mentioned_urls, mentioned_urls_corpus
+        return mentioned_urls, url_counter
+
+    def load_mentioned_urls(self, news_label="fake"):
+        mentioned_urls, url_counter = self.mentioned_url_counts(news_label)
+        return mentioned_urls, list(url_counter.elements())
 
     def export_mentioned_urls(self, mentioned_urls_path, mentioned_urls_freq_path):
-        fake_mentioned_urls, fake_mentioned_urls_corpus = self.load_mentioned_urls(news_label="fake")
-        real_mentioned_urls, real_mentioned_urls_corpus = self.load_mentioned_urls(news_label="real")
+        fake_mentioned_urls, fake_cnt = self.mentioned_url_counts(news_label="fake")
+        real_mentioned_urls, real_cnt = self.mentioned_url_counts(news_label="real")
         mentioned_urls = fake_mentioned_urls + real_mentioned_urls
-        # mentioned_urls_corpus = fake_mentioned_urls_corpus + real_mentioned_urls_corpus
-        fake_cnt, real_cnt = Counter(), Counter()
-        for url in fake_mentioned_urls_corpus:
-            fake_cnt[url] += 1
-        for url in real_mentioned_urls_corpus:
-            real_cnt[url] += 1
         cnt = fake_cnt + real_cnt
         mentioned_urls_freq_content = []
         mentioned_urls_freq_header = ["mentioned_url", "frequency", "label"]
@@ -87,13 +273,15 @@ class FakeNewsNetDatasetLoader(BaseDatasetLoader):
         utils.write_csv(mentioned_urls_freq_content, mentioned_urls_freq_header, mentioned_urls_freq_path)
         utils.write_csv(mentioned_urls, mentioned_urls_header, mentioned_urls_path)
 
+    def source_url_counts(self, news_label="fake"):
+        news_urls, url_counter = self.analyse_urls("source_urls", self.news_content_mtime, self.news_source_urls,
+                                                   news_label)
+        return [urls[0] for urls in news_urls.values() if urls is not None], url_counter
+
     def export_source_urls_analysis(self, path):
-        fake_source_urls = self.load_source_urls(news_label="fake")
-        real_source_urls = self.load_source_urls(news_label="real")
-        source_urls = fake_source_urls + real_source_urls
-        cnt = Counter()
-        for url in source_urls:
-            cnt[url] += 1
+        _, fake_cnt = self.source_url_counts(news_label="fake")
+        _, real_cnt = self.source_url_counts(news_label="real")
+        cnt = fake_cnt + real_cnt
         content = []
         header = ["source_url", "frequency"]
         for source_url, frequency in cnt.most_common():
@@ -101,75 +289,171 @@ class FakeNewsNetDatasetLoader(BaseDatasetLoader):
         utils.write_csv(content, header, path)
 
     def load_source_urls(self, news_label="fake"):
-        source_urls = []
+        return self.source_url_counts(news_label)[0]
 
+    def news_dirs(self, news_label="fake"):
         for dataset in self.DATASETS:
-            dataset_dir = os.path.join(self.fnn_root, dataset)
-            news_label_dir = os.path.join(dataset_dir, news_label)
-            for news_id in os.listdir(news_label_dir):
-                news_dir = os.path.join(news_label_dir, news_id)
-                news_content_path = os.path.join(news_dir, "news content.json")
-                if not os.path.isfile(news_content_path):
-                    continue
-                news_content = utils.read_json(news_content_path)
-                source_url = news_content["url"]
-                source_home_url = utils.extract_home_url(source_url)
-                source_urls.append(source_home_url)
+            news_label_dir = os.path.join(self.fnn_root, dataset, news_label)
+            for news_id in self.tree.listdir(news_label_dir):
+                yield os.path.join(news_label_dir, news_id)
+
+    def iter_texts(self, news_label="fake"):
+        """Raw title, description and tweet texts of every news, to precompute word segmentations from."""
+        for news_dir in self.news_dirs(news_label):
+            news = self.read_news(news_dir)
+            if news is not None:
+                news_title, news_description, tweet_texts = news
+                yield news_title
+                yield news_description
+                yield from tweet_texts
+
+    def manifest(self, news_label="fake"):
+        return FakeNewsNetManifest.load(self.fnn_root, self.DATASETS, news_label, self.tree)
+
+    def manifest_news(self, news_label="fake", batch_range=()):
+        """Selected (news directory, tweet files) of `batch_range` looked up in the manifest."""
+        manifest = self.manifest(news_label)
+        num_selected = 0
+        for news_dir, tweet_files in manifest.select(batch_range):
+            num_selected += len(tweet_files)
+            yield news_dir, tweet_files
+        print("Selected {} of {} Fake News Net tweets".format(num_selected, manifest.num_tweets()))
+
+    def read_selected_news(self, selection):
+        news = self.read_news(*selection)
+        return news if news is not None and len(news[2]) > 0 else None
+
+    def read_news(self, news_dir, tweet_files=None):
+        """Raw title, description and tweet texts of a news, None if it has no content or no tweets.
+
+        Only `tweet_files` are read when given, instead of every file of the tweets directory.
+        """
+        tweet_dir = os.path.join(news_dir, "tweets")
+        news_content_path = os.path.join(news_dir, "news content.json")
+        if not self.tree.isfile(news_content_path):
+            return None
+        news_content = self.tree.read_json(news_content_path, fields=["title", "meta_data.description"])
+        news_title = news_content["title"] if "title" in news_content else ""
+        news_description = news_content["meta_data"]["description"] \
+            if "description" in news_content["meta_data"] else ""
+        if not self.tree.isdir(tweet_dir):
+            return None
+        tweet_texts = [tweet["text"] for tweet in self.tree.read_jsons(tweet_dir, tweet_files, fields=["text"])]
+        return news_title, news_description, tweet_texts
+
+    def select_news_tweets(self, news_iter, batch_range=()):
+        """Number the tweets of consecutive news and keep the news with tweets inside `batch_range`."""
+        i = 0
+        for news in news_iter:
+            if len(batch_range) > 0 and i > batch_range[1]:
+                return
+            if news is None:
+                continue
+            news_title, news_description, tweet_texts = news
+            selected_tweet_texts = []
+            for tweet_text in tweet_texts:
+                if i % self.info_every == 0:
+                    print("Loaded {} Fake News Net tweets".format(str(i)))
+                if len(batch_range) > 0 and i > batch_range[0]:
+                    selected_tweet_texts.append(tweet_text)
+                i += 1
+            if len(selected_tweet_texts) > 0:
+                yield news_title, news_description, selected_tweet_texts
 
-        return source_urls
+    @staticmethod
+    def news_features(news, clean=True, num_workers=None):
+        news_title, news_description, tweet_texts = news
+        if clean:
+            news_title, news_description = utils.clean_tweet_texts([news_title, news_description], num_workers)
+            tweet_texts = utils.clean_tweet_texts(tweet_texts, num_workers)
+        else:
+            tweet_texts = [tweet_text.replace("\n", " ") for tweet_text in tweet_texts]
+        feature_set = []
+        for tweet_text in tweet_texts:
+            if len(news_title) > 0:
+                clean_tweet_text = utils.clean_stance_target(tweet_text, news_title) if clean else tweet_text
+                feature_set.append([clean_tweet_text, news_title])
+            if len(news_description) > 0:
+                clean_tweet_text = utils.clean_stance_target(tweet_text, news_description) if clean else tweet_text
+                feature_set.append([clean_tweet_text, news_description])
+        return feature_set
+
+    @classmethod
+    def news_feature_sets(cls, news, cleans=(True,), num_workers=None):
+        return [cls.news_features(news, clean, num_workers) for clean in cleans]
 
     def load(self, clean=True, news_label="fake", batch_range=()):
-        feature_set, label_set = [], []
-
-        i = 0
-        for dataset in self.DATASETS:
-            dataset_dir = os.path.join(self.fnn_root, dataset)
-            news_label_dir = os.path.join(dataset_dir, news_label)
-            for news_id in os.listdir(news_label_dir):
-                if len(batch_range) > 0 and i > batch_range[1]:
-                    break
-                news_dir = os.path.join(news_label_dir, news_id)
-                tweet_dir = os.path.join(news_dir, "tweets")
-                news_content_path = os.path.join(news_dir, "news content.json")
-                if not os.path.isfile(news_content_path):
-                    continue
-                news_content = utils.read_json(news_content_path)
-                news_title = news_content["title"] if "title" in news_content else ""
-                news_description = news_content["meta_data"]["description"] \
-                    if "description" in news_content["meta_data"] else ""
-                if clean:
-                    news_title = utils.clean_tweet_text(news_title)
-                    news_description = utils.clean_tweet_text(news_description)
-                if not os.path.isdir(tweet_dir):
-                    continue
-                for tweet_id in os.listdir(tweet_dir):
-                    if i % self.info_every == 0:
-                        print("Loaded {} Fake News Net tweets".format(str(i)))
-                    tweet_path = os.path.join(tweet_dir, tweet_id)
-                    tweet_content = utils.read_json(tweet_path)
-                    tweet_text = utils.clean_tweet_text(tweet_content["text"]) if clean else tweet_content["text"].replace("\n", " ")
-                    if len(batch_range) > 0 and i > batch_range[0]:
-                        if len(news_title) > 0:
-                            clean_tweet_text = utils.clean_stance_target(tweet_text, news_title) \
-                                if clean else tweet_text
-                            feature_set.append([clean_tweet_text, news_title])
-                            label_set.append(self.DEFAULT_STANCE)
-                        if len(news_description) > 0:
-                            clean_tweet_text = utils.clean_stance_target(tweet_text, news_description) \
-                                if clean else tweet_text
-                            feature_set.append([clean_tweet_text, news_description])
-                            label_set.append(self.DEFAULT_STANCE)
-                    i += 1
-
-        return StanceDataset(feature_set, label_set)
+        return self.load_many((clean,), news_label, batch_range)[0]
+
+    def load_both(self, news_label="fake", batch_range=()):
+        """Uncleaned and cleaned datasets from a single pass over the news and tweet files."""
+        return self.load_many((False, True), news_label, batch_range)
+
+    def selected_news(self, map_fn, news_label="fake", batch_range=()):
+        """Raw news restricted to `batch_range`, files are read with `map_fn` (map or a pooled equivalent).
+
+        With the manifest only the tweet files inside the range are opened, otherwise every news is read
+        and numbered in order.
+        """
+        if self.use_manifest and len(batch_range) > 0:
+            news_iter = map_fn(self.read_selected_news, self.manifest_news(news_label, batch_range))
+            return (news for news in news_iter if news is not None)
+        return self.select_news_tweets(map_fn(self.read_news, self.news_dirs(news_label)), batch_range)
+
+    def load_many(self, cleans, news_label="fake", batch_range=()):
+        feature_sets = [[] for _ in cleans]
+        for news_feature_sets in self.iter_news_feature_sets(cleans, news_label, batch_range):
+            for feature_set, features in zip(feature_sets, news_feature_sets):
+                feature_set += features
+        return [StanceDataset(feature_set, [self.DEFAULT_STANCE] * len(feature_set)) for feature_set in feature_sets]
+
+    def iter_records(self, clean=True, news_label="fake", batch_range=()):
+        """Validated (idx, source, target, label) records of `load`, produced news by news."""
+        idx = 0
+        for news_feature_sets in self.iter_news_feature_sets((clean,), news_label, batch_range):
+            for source, target in news_feature_sets[0]:
+                StanceDataset.validate_record(source, target, self.DEFAULT_STANCE)
+                yield idx, source, target, self.DEFAULT_STANCE
+                idx += 1
+
+    def iter_news_feature_sets(self, cleans, news_label="fake", batch_range=()):
+        if self.num_workers > 1 or self.num_threads > 1:
+            return self.iter_news_feature_sets_parallel(cleans, news_label, batch_range)
+        return (self.news_feature_sets(news, cleans) for news in self.selected_news(map, news_label, batch_range))
+
+    def iter_news_feature_sets_parallel(self, cleans, news_label="fake", batch_range=(), max_pending=64):
+        """Same feature sets as the serial load, reading files on a thread pool and cleaning on a process pool.
+
+        News are read, selected and cleaned in order through bounded queues of `max_pending` news. Texts are
+        looked up in the clean cache before a news is sent to the forked cleaners, which return what they cleaned.
+        Without fork news are cleaned in this process.
+        """
+        # load the vocabulary once so that forked workers inherit it
+        len(utils.COMMON_ENGLISH_WORDS)
+        with ThreadPoolExecutor(max_workers=self.num_threads) as reader:
+            selected_news = self.selected_news(partial(utils.bounded_map, reader, max_pending=max_pending),
+                                               news_label, batch_range)
+            if not any(cleans) or "fork" not in multiprocessing.get_all_start_methods():
+                yield from (self.news_feature_sets(news, cleans) for news in selected_news)
+                return
+            with ProcessPoolExecutor(max_workers=self.num_workers,
+                                     mp_context=multiprocessing.get_context("fork")) as cleaner:
+                news_feature_sets = partial(utils.clean_with_cleanings,
+                                            partial(self.news_feature_sets, cleans=cleans, num_workers=1))
+                tasks = ((news, utils.cached_cleanings([news[0], news[1]] + news[2])) for news in selected_news)
+                for feature_sets, cleanings in utils.bounded_map(cleaner, news_feature_sets, tasks, max_pending):
+                    utils.store_cleanings(cleanings)
+                    yield feature_sets
 
 
 class RumorEval17(BaseDatasetLoader):
     HEADLINE_HEADER = ["url_id", "full_url", "headline", "media", "clean"]
 
-    def __init__(self, re_root, info_every=10):
+    def __init__(self, re_root, info_every=10, num_workers=1, tree=FILE_TREE):
         super().__init__(info_every)
         self.re_root = re_root
+        self.num_workers = num_workers
+        self.tree = tree
         self.re_data = os.path.join(self.re_root, "rumoureval-data")
         self.traindev = os.path.join(self.re_root, "traindev")
         self.headline_csv = os.path.join(self.re_root, "headlines.csv")
@@ -192,36 +476,57 @@ class RumorEval17(BaseDatasetLoader):
                     headline_map[url_id] = headline
         return headline_map
 
-    def crawl_headlines(self):
-        headline_map = {}
-        headline_crawler = utils.HeadlineCrawler()
-
-        i = 0
-        for topic in os.listdir(self.re_data):
-            topic_path = os.path.join(self.re_data, topic)
-            for discourse_id in os.listdir(topic_path):
-                discourse_id_path = os.path.join(topic_path, discourse_id)
-                url_data = os.path.join(discourse_id_path, "urls.dat")
-
-                with open(url_data, "r", encoding="utf-8") as f:
-                    csv_reader = csv.reader(f, delimiter="\t", quotechar='"')
-                    for row in csv_reader:
-                        if i % self.info_every == 0:
-                            print("Loaded {} rumor eval 17 headlines".format(str(i)))
-                        url_id, shortened_url, full_url = row[0], row[1], row[2]
-                        try:
-                            if url_id not in headline_map:
-                                headline, news_media = headline_crawler.crawl_url_title(full_url)
-                                if url_id not in headline_map:
-                                    headline_map[url_id] = (full_url, headline, news_media)
-                            i += 1
-                        except urllib3.exceptions.HTTPError:
-                            continue
-
-        # by default all rows are clean
-        headline_content = [[url_id, full_url, headline, news_media, "1"]
-                            for url_id, (full_url, headline, news_media) in headline_map.items()]
-        utils.write_csv(headline_content, RumorEval17.HEADLINE_HEADER, self.headline_csv)
+    def crawl_headlines(self, concurrency=16, host_interval=0.5, timeout=10.0, retries=3):
+        """Crawl the headline of every url of the discourses into the headline csv.
+
+        Headlines are appended to a partial csv as they are crawled and the partial csv becomes the headline csv
+        once every url is done. An interrupted crawl resumes with the url ids missing from the partial csv, urls
+        still failing after every retry are left out of it so that the partial csv is kept and the next crawl
+        retries them. Returns the number of such urls.
+        """
+        partial_headline_csv = self.headline_csv + ".partial"
+        crawled_url_ids = set()
+        if os.path.isfile(partial_headline_csv):
+            crawled_url_ids = {row[0] for row in utils.read_csv(partial_headline_csv)}
+            print("Resuming headline crawl after {} urls".format(len(crawled_url_ids)))
+
+        urls = {}
+        for discourse_id_path in self.discourse_paths():
+            url_data = os.path.join(discourse_id_path, "urls.dat")
+            csv_reader = csv.reader(io.StringIO(self.tree.read_text(url_data)), delimiter="\t", quotechar='"')
+            for row in csv_reader:
+                url_id, shortened_url, full_url = row[0], row[1], row[2]
+                if url_id not in urls and url_id not in crawled_url_ids:
+                    urls[url_id] = full_url
+
+        is_new = not os.path.isfile(partial_headline_csv)
+        with open(utils.ensure_path(partial_headline_csv), "a", encoding="utf-8", newline='') as f:
+            csv_writer = csv.writer(f, delimiter=",", quotechar='"', quoting=csv.QUOTE_MINIMAL)
+            if is_new:
+                csv_writer.writerow(RumorEval17.HEADLINE_HEADER)
+            num_crawled, num_failed = 0, 0
+
+            def write_headline(url_id, full_url, result):
+                nonlocal num_crawled, num_failed
+                if num_crawled % self.info_every == 0:
+                    print("Loaded {} rumor eval 17 headlines".format(str(num_crawled)))
+                num_crawled += 1
+                if result is None:
+                    num_failed += 1
+                    return
+                headline, news_media = result
+                # by default all rows are clean
+                csv_writer.writerow([url_id, full_url, headline, news_media, "1"])
+                f.flush()
+
+            crawler = utils.AsyncHeadlineCrawler(concurrency, host_interval, timeout, retries)
+            crawler.crawl(urls.items(), write_headline)
+        if num_failed > 0:
+            print("Failed to crawl {} of {} urls, crawl again to retry them from {}".format(
+                num_failed, len(urls), partial_headline_csv))
+        else:
+            os.replace(partial_headline_csv, self.headline_csv)
+        return num_failed
 
     @staticmethod
     def convert_stance(raw_stance):
@@ -236,14 +541,16 @@ class RumorEval17(BaseDatasetLoader):
         raise ValueError("Unsupported stance {}".format(raw_stance))
 
     @staticmethod
-    def load_tweet_folder(tweet_folder_path):
+    def load_tweet_folder(tweet_folder_path, num_workers=None, tree=FILE_TREE):
+        return RumorEval17.clean_tweet_map(tree.read_jsons(tweet_folder_path, fields=["id", "text"]), num_workers)
+
+    @staticmethod
+    def clean_tweet_map(tweet_jsons, num_workers=None):
         tweet_map = {}
-        for tweet_path in os.listdir(tweet_folder_path):
-            tweet_full_path = os.path.join(tweet_folder_path, tweet_path)
-            tweet_json = utils.read_json(tweet_full_path)
-            tweet_text = utils.clean_tweet_text(tweet_json["text"]).strip().rstrip()
-            if len(tweet_text) > 0:
-                tweet_map[str(tweet_json["id"])] = utils.clean_tweet_text(tweet_json["text"])
+        tweet_texts = utils.clean_tweet_texts([tweet_json["text"] for tweet_json in tweet_jsons], num_workers)
+        for tweet_json, tweet_text in zip(tweet_jsons, tweet_texts):
+            if len(tweet_text.strip().rstrip()) > 0:
+                tweet_map[str(tweet_json["id"])] = tweet_text
         return tweet_map
 
     @staticmethod
@@ -259,90 +566,175 @@ class RumorEval17(BaseDatasetLoader):
     @staticmethod
     def annotate_tweet(tweet_structure, label_map, headlines, feature_set,
                        label_set, prop_headline_label_map, full_tweet_map):
-        for tweet, replies in tweet_structure.items():
-            if type(replies) is not dict:
-                continue
-            for reply in replies.keys():
-                if tweet not in full_tweet_map:
-                    print("Tweet {} does not have any text".format(tweet))
+        """Annotate every (reply, tweet) edge of the structure tree in depth first order.
+
+        The tree is walked with an explicit stack of dict iterators so deep threads do not hit the recursion limit.
+        """
+        stack = [iter(tweet_structure.items())]
+        while len(stack) > 0:
+            for tweet, replies in stack[-1]:
+                if type(replies) is not dict:
                     continue
-                if reply not in full_tweet_map:
-                    print("Tweet {} does not have any text".format(reply))
-                    continue
-                if reply not in label_map:
-                    print("Tweet {} does not have any label".format(reply))
-                    continue
-                tweet_text = full_tweet_map[tweet]
-                reply_text = full_tweet_map[reply]
-                try:
-                    reply_stance = RumorEval17.convert_stance(label_map[reply])
-                    feature_set.append([reply_text, tweet_text])
-                    label_set.append(reply_stance)
-                    if tweet in prop_headline_label_map:
-                        reply_headline_label = RumorEval17.propagate_headline_label(
-                            prop_headline_label_map[tweet], reply_stance)
-                        prop_headline_label_map[reply] = reply_headline_label
-                        for headline in headlines:
-                            feature_set.append([reply_text, headline])
-                            label_set.append(reply_headline_label)
-                except ValueError as e:
-                    print(str(e))
-            RumorEval17.annotate_tweet(replies, label_map, headlines, feature_set,
-                                       label_set, prop_headline_label_map, full_tweet_map)
+                for reply in replies.keys():
+                    if tweet not in full_tweet_map:
+                        print("Tweet {} does not have any text".format(tweet))
+                        continue
+                    if reply not in full_tweet_map:
+                        print("Tweet {} does not have any text".format(reply))
+                        continue
+                    if reply not in label_map:
+                        print("Tweet {} does not have any label".format(reply))
+                        continue
+                    tweet_text = full_tweet_map[tweet]
+                    reply_text = full_tweet_map[reply]
+                    try:
+                        reply_stance = RumorEval17.convert_stance(label_map[reply])
+                        feature_set.append([reply_text, tweet_text])
+                        label_set.append(reply_stance)
+                        if tweet in prop_headline_label_map:
+                            reply_headline_label = RumorEval17.propagate_headline_label(
+                                prop_headline_label_map[tweet], reply_stance)
+                            prop_headline_label_map[reply] = reply_headline_label
+                            for headline in headlines:
+                                feature_set.append([reply_text, headline])
+                                label_set.append(reply_headline_label)
+                    except ValueError as e:
+                        print(str(e))
+                stack.append(iter(replies.items()))
+                break
+            else:
+                stack.pop()
 
-    def load(self):
+    def load(self, compact=False):
+        # iter_records validates every record already
+        return StanceDataset.from_records(self.iter_records(), compact, validate="off")
+
+    def iter_records(self):
+        """Validated (idx, source, target, label) records of `load`, produced discourse by discourse."""
         if not os.path.isfile(self.headline_csv):
             print("Crawl new headline data to {}".format(self.headline_csv))
-            self.crawl_headlines()
+            num_failed = self.crawl_headlines()
+            if num_failed > 0:
+                raise RuntimeError("Headlines of {} urls could not be crawled, rerun to retry them".format(num_failed))
         headline_map = self.load_headlines()
         label_map = self.load_labels()
-        feature_set, label_set = [], []
+        yield from self.iter_discourse_records(self.discourse_paths(), label_map, headline_map)
 
+    def discourse_paths(self):
         i = 0
-        for topic in os.listdir(self.re_data):
+        for topic in self.tree.listdir(self.re_data):
             topic_path = os.path.join(self.re_data, topic)
-            for discourse_id in os.listdir(topic_path):
+            for discourse_id in self.tree.listdir(topic_path):
                 if i % self.info_every == 0:
                     print("Loaded {} rumor eval 17 discourses".format(str(i)))
-                discourse_id_path = os.path.join(topic_path, discourse_id)
-                reply_folder_path = os.path.join(discourse_id_path, "replies")
-                source_folder_path = os.path.join(discourse_id_path, "source-tweet")
-                reply_map = self.load_tweet_folder(reply_folder_path)
-                source_map = self.load_tweet_folder(source_folder_path)
-                full_tweet_map = {**reply_map, **source_map}
-                url_data = os.path.join(discourse_id_path, "urls.dat")
-                tweet_structure = utils.read_json(os.path.join(discourse_id_path, "structure.json"))
-                headlines = []
-                with open(url_data, "r", encoding="utf-8") as f:
-                    csv_reader = csv.reader(f, delimiter="\t", quotechar='"')
-                    for row in csv_reader:
-                        url_id, shortened_url, full_url = row[0], row[1], row[2]
-                        if url_id in headline_map:
-                            headlines.append(headline_map[url_id])
-                        else:
-                            print("Url {} not found".format(url_id))
-                prop_headline_label_map = {}
-                for source, source_text in source_map.items():
-                    if source not in label_map:
-                        print("Tweet {} does not have any label".format(source))
-                        continue
-                    try:
-                        source_label = self.convert_stance(label_map[source])
-                        for headline in headlines:
-                            feature_set.append([source_text, headline])
-                            label_set.append(source_label)
-                            prop_headline_label_map[source] = source_label
-                    except ValueError as e:
-                        print(str(e))
-                self.annotate_tweet(tweet_structure, label_map, headlines, feature_set,
-                                    label_set, prop_headline_label_map, full_tweet_map)
+                yield os.path.join(topic_path, discourse_id)
             i += 1
-        return StanceDataset(feature_set, label_set)
+
+    def iter_texts(self):
+        """Raw texts of every source tweet and reply, to precompute word segmentations from."""
+        for discourse_id_path in self.discourse_paths():
+            for tweet_folder in ["source-tweet", "replies"]:
+                for tweet_json in self.tree.read_jsons(os.path.join(discourse_id_path, tweet_folder), fields=["text"]):
+                    yield tweet_json["text"]
+
+    def iter_discourse_records(self, discourse_paths, label_map, headline_map, max_pending=64):
+        """Records of every discourse in order, discourses are built on a process pool if `num_workers` > 1.
+
+        Discourses are read and their texts looked up in the clean cache before being sent to the forked
+        workers, which share this loader and the maps and return what they cleaned.
+        """
+        global _DISCOURSE_LOADER
+        if self.num_workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+            load_discourse = partial(self.load_discourse, label_map=label_map, headline_map=headline_map)
+            yield from self.discourse_records(map(load_discourse, discourse_paths))
+            return
+        # load the vocabulary once so that forked workers inherit it
+        len(utils.COMMON_ENGLISH_WORDS)
+        _DISCOURSE_LOADER = self, label_map, headline_map
+        try:
+            with ProcessPoolExecutor(max_workers=self.num_workers,
+                                     mp_context=multiprocessing.get_context("fork")) as executor:
+                tasks = ((discourse, utils.cached_cleanings(self.discourse_texts(discourse)))
+                         for discourse in map(self.read_discourse, discourse_paths))
+                build_discourse = partial(utils.clean_with_cleanings, build_discourse_in_worker)
+                yield from self.discourse_records(self.stored_cleanings(
+                    utils.bounded_map(executor, build_discourse, tasks, max_pending)))
+        finally:
+            _DISCOURSE_LOADER = None
+
+    @staticmethod
+    def stored_cleanings(results):
+        for result, cleanings in results:
+            utils.store_cleanings(cleanings)
+            yield result
+
+    @staticmethod
+    def discourse_records(discourses):
+        idx = 0
+        for feature_set, label_set in discourses:
+            for (source, target), label in zip(feature_set, label_set):
+                StanceDataset.validate_record(source, target, label)
+                yield idx, source, target, label
+                idx += 1
+
+    def load_discourse(self, discourse_id_path, label_map, headline_map, num_workers=None):
+        """Feature and label sets of one discourse, independent from every other discourse."""
+        return self.build_discourse(self.read_discourse(discourse_id_path), label_map, headline_map, num_workers)
+
+    def read_discourse(self, discourse_id_path):
+        """Raw reply and source tweet jsons, structure and url rows of one discourse."""
+        reply_jsons = self.tree.read_jsons(os.path.join(discourse_id_path, "replies"), fields=["id", "text"])
+        source_jsons = self.tree.read_jsons(os.path.join(discourse_id_path, "source-tweet"), fields=["id", "text"])
+        tweet_structure = self.tree.read_json(os.path.join(discourse_id_path, "structure.json"))
+        url_data = os.path.join(discourse_id_path, "urls.dat")
+        url_rows = list(csv.reader(io.StringIO(self.tree.read_text(url_data)), delimiter="\t", quotechar='"'))
+        return reply_jsons, source_jsons, tweet_structure, url_rows
+
+    @staticmethod
+    def discourse_texts(discourse):
+        reply_jsons, source_jsons, _, _ = discourse
+        return [tweet_json["text"] for tweet_json in reply_jsons + source_jsons]
+
+    def build_discourse(self, discourse, label_map, headline_map, num_workers=None):
+        """Feature and label sets of a discourse read by `read_discourse`."""
+        reply_jsons, source_jsons, tweet_structure, url_rows = discourse
+        feature_set, label_set = [], []
+        reply_map = self.clean_tweet_map(reply_jsons, num_workers)
+        source_map = self.clean_tweet_map(source_jsons, num_workers)
+        full_tweet_map = {**reply_map, **source_map}
+        headlines = []
+        for row in url_rows:
+            url_id, shortened_url, full_url = row[0], row[1], row[2]
+            if url_id in headline_map:
+                headlines.append(headline_map[url_id])
+            else:
+                print("Url {} not found".format(url_id))
+        prop_headline_label_map = {}
+        for source, source_text in source_map.items():
+            if source not in label_map:
+                print("Tweet {} does not have any label".format(source))
+                continue
+            try:
+                source_label = self.convert_stance(label_map[source])
+                for headline in headlines:
+                    feature_set.append([source_text, headline])
+                    label_set.append(source_label)
+                    prop_headline_label_map[source] = source_label
+            except ValueError as e:
+                print(str(e))
+        self.annotate_tweet(tweet_structure, label_map, headlines, feature_set,
+                            label_set, prop_headline_label_map, full_tweet_map)
+        return feature_set, label_set
+
+
+def build_discourse_in_worker(discourse):
+    loader, label_map, headline_map = _DISCOURSE_LOADER
+    return loader.build_discourse(discourse, label_map, headline_map, num_workers=1)
 
 
 class RumorEvalTwitter19(RumorEval17):
-    def __init__(self, re_root, info_every=10):
-        super(RumorEvalTwitter19, self).__init__(re_root, info_every)
+    def __init__(self, re_root, info_every=10, num_workers=1, tree=FILE_TREE):
+        super(RumorEvalTwitter19, self).__init__(re_root, info_every, num_workers, tree)
         self.traindev = os.path.join(self.re_root, "rumoureval-2019-training-data")
         self.re_data = os.path.join(self.traindev, "twitter-english")
         self.headline_csv = os.path.join(self.re_root, "headlines_twitter.csv")
@@ -359,62 +751,29 @@ class RumorEvalTwitter19(RumorEval17):
 
 
 class RumorEvalReddit19(RumorEvalTwitter19):
-    def __init__(self, re_root, info_every=10):
-        super(RumorEvalReddit19, self).__init__(re_root, info_every)
+    def __init__(self, re_root, info_every=10, num_workers=1, tree=FILE_TREE):
+        super(RumorEvalReddit19, self).__init__(re_root, info_every, num_workers, tree)
         self.re_data = os.path.join(self.traindev, "reddit-training-data")
 
-    def load(self):
+    def iter_records(self):
         label_map = self.load_labels()
-        feature_set, label_set = [], []
+        # reddit discourses have no crawled headlines
+        yield from self.iter_discourse_records(self.discourse_paths(), label_map, {})
 
-        i = 0
-        for discourse_id in os.listdir(self.re_data):
+    def discourse_paths(self):
+        for i, discourse_id in enumerate(self.tree.listdir(self.re_data)):
             if i % self.info_every == 0:
                 print("Loaded {} rumor eval 19 reddit discourses".format(str(i)))
-            discourse_id_path = os.path.join(self.re_data, discourse_id)
-            reply_folder_path = os.path.join(discourse_id_path, "replies")
-            source_folder_path = os.path.join(discourse_id_path, "source-tweet")
-            reply_map = self.load_tweet_folder(reply_folder_path)
-            source_map = self.load_tweet_folder(source_folder_path)
-            full_tweet_map = {**reply_map, **source_map}
-            url_data = os.path.join(discourse_id_path, "urls.dat")
-            tweet_structure = utils.read_json(os.path.join(discourse_id_path, "structure.json"))
-            headlines = []
-            with open(url_data, "r", encoding="utf-8") as f:
-                csv_reader = csv.reader(f, delimiter="\t", quotechar='"')
-                for row in csv_reader:
-                    url_id, shortened_url, full_url = row[0], row[1], row[2]
-                    if url_id in headline_map:
-                        headlines.append(headline_map[url_id])
-                    else:
-                        print("Url {} not found".format(url_id))
-            prop_headline_label_map = {}
-            for source, source_text in source_map.items():
-                if source not in label_map:
-                    print("Tweet {} does not have any label".format(source))
-                    continue
-                try:
-                    source_label = self.convert_stance(label_map[source])
-                    for headline in headlines:
-                        feature_set.append([source_text, headline])
-                        label_set.append(source_label)
-                        prop_headline_label_map[source] = source_label
-                except ValueError as e:
-                    print(str(e))
-            self.annotate_tweet(tweet_structure, label_map, headlines, feature_set,
-                                label_set, prop_headline_label_map, full_tweet_map)
-            i += 1
-        return StanceDataset(feature_set, label_set)
+            yield os.path.join(self.re_data, discourse_id)
 
     @staticmethod
-    def load_reddit_folder(tweet_folder_path):
+    def load_reddit_folder(tweet_folder_path, num_workers=None, tree=FILE_TREE):
         tweet_map = {}
-        for tweet_path in os.listdir(tweet_folder_path):
-            tweet_full_path = os.path.join(tweet_folder_path, tweet_path)
-            tweet_json = utils.read_json(tweet_full_path)
-            tweet_text = utils.clean_tweet_text(tweet_json["text"]).strip().rstrip()
-            if len(tweet_text) > 0:
-                tweet_map[str(tweet_json["id"])] = utils.clean_tweet_text(tweet_json["text"])
+        tweet_jsons = tree.read_jsons(tweet_folder_path, fields=["id", "text"])
+        tweet_texts = utils.clean_tweet_texts([tweet_json["text"] for tweet_json in tweet_jsons], num_workers)
+        for tweet_json, tweet_text in zip(tweet_jsons, tweet_texts):
+            if len(tweet_text.strip().rstrip()) > 0:
+                tweet_map[str(tweet_json["id"])] = tweet_text
         return tweet_map
 
 
@@ -454,10 +813,11 @@ class FncLoader(BaseDatasetLoader):
             return stances_map[raw_stance]
         raise ValueError("Unsupported stance {}".format(raw_stance))
 
-    def load_full(self):
-        bodies_map = self.load_bodies()
-        feature_set, label_set = [], []
+    def load_raw(self):
+        """Bodies map and raw (headline, body_id, raw_stance) stance records, parsed once for every view."""
+        return self.load_bodies(), list(self.iter_raw_stances())
 
+    def iter_raw_stances(self):
         with open(self.fnc_train_stances, "r", encoding="utf-8") as f:
             csv_reader = csv.reader(f, delimiter=",", quotechar='"')
             for i, row in enumerate(csv_reader):
@@ -466,37 +826,71 @@ class FncLoader(BaseDatasetLoader):
                 if i == 0:
                     print("Skipping header " + str(row))
                 else:
-                    try:
-                        headline, body_id, stance = row[0], row[1], self.convert_stance(row[2])
-                        body_content = bodies_map[body_id]
-                        feature_set.append([body_content, headline])
-                        label_set.append(stance)
-                    except ValueError as e:
-                        continue
-                        # print(str(e))
+                    yield row[0], row[1], row[2]
+
+    def iter_stances(self, raw_stances=None):
+        """(headline, body_id, stance) of every stance row with a supported stance."""
+        raw_stances = raw_stances if raw_stances is not None else self.iter_raw_stances()
+        for headline, body_id, raw_stance in raw_stances:
+            try:
+                yield headline, body_id, self.convert_stance(raw_stance)
+            except ValueError as e:
+                continue
+                # print(str(e))
 
+    def load_full(self):
+        bodies_map = self.load_bodies()
+        feature_set, label_set = [], []
+        for headline, body_id, stance in self.iter_stances():
+            feature_set.append([bodies_map[body_id], headline])
+            label_set.append(stance)
         return feature_set, label_set
 
+    def load_table(self, split=False, bodies_map=None):
+        """Table of body texts, each stored once, and the table indices of every body id.
+
+        Bodies are flattened to a single line, or split into their non empty paragraphs if `split` is set.
+        """
+        bodies_map = bodies_map if bodies_map is not None else self.load_bodies()
+        table, table_idxs = [], {}
+        for body_id, body_content in bodies_map.items():
+            sources = [paragraph for paragraph in body_content.splitlines() if len(paragraph.strip().rstrip()) > 0] \
+                if split else [body_content.replace("\n", " ")]
+            table_idxs[body_id] = range(len(table), len(table) + len(sources))
+            table += sources
+        return table, table_idxs
+
+    def iter_rows(self, table_idxs, raw_stances=None):
+        """(table_idx, headline, stance) rows, one per stance or one per body paragraph of a stance."""
+        for headline, body_id, stance in self.iter_stances(raw_stances):
+            for table_idx in table_idxs[body_id]:
+                yield table_idx, headline, stance
+
+    def iter_records(self, split=False):
+        """Validated (idx, source, target, label) records of `load`, or of `load_split` if `split` is set."""
+        table, table_idxs = self.load_table(split)
+        for idx, (table_idx, headline, stance) in enumerate(self.iter_rows(table_idxs)):
+            self.dataset.validate_record(table[table_idx], headline, stance)
+            yield idx, table[table_idx], headline, stance
+
+    def load_interned(self, split=False, raw=None):
+        """Dataset whose feature set stores each body, or body paragraph, once.
+
+        `raw` is the result of `load_raw`, of any FNC loader, to derive the dataset without parsing the csv again.
+        """
+        bodies_map, raw_stances = raw if raw is not None else (None, None)
+        table, table_idxs = self.load_table(split, bodies_map)
+        rows, label_set = [], []
+        for table_idx, headline, stance in self.iter_rows(table_idxs, raw_stances):
+            rows.append((table_idx, headline))
+            label_set.append(stance)
+        return self.dataset(InternedFeatureSet(table, rows), label_set)
+
     def load(self):
-        feature_set, label_set = self.load_full()
-        cleaned_feature_set = []
-        for i, feature in enumerate(feature_set):
-            source, target = feature[0], feature[1]
-            cleaned_feature_set.append([source.replace("\n", " "), target])
-        return self.dataset(cleaned_feature_set, label_set)
+        return self.load_interned()
 
     def load_split(self):
-        feature_set, label_set = self.load_full()
-        split_feature_set, split_label_set = [], []
-        for i, feature in enumerate(feature_set):
-            label = label_set[i]
-            source, target = feature[0], feature[1]
-            for paragraph in source.splitlines():
-                if len(paragraph.strip().rstrip()) > 0:
-                    split_feature_set.append([paragraph, target])
-                    split_label_set.append(label)
-
-        return self.dataset(split_feature_set, split_label_set)
+        return self.load_interned(split=True)
 
 
 class FncRelationLoader(FncLoader):
@@ -0,0 +1,119 @@
+import csv
+import io
+import json
+import mmap
+import os
+import numpy as np
+import utils
+
+FOLD_SPLITS = ["train", "dev"]
+
+
+def encode_csv_rows(rows, delimiter=",", lineterminator="\r\n"):
+    """Text of every row as utils.write_csv writes it."""
+    buffer = io.StringIO(newline="")
+    csv_writer = csv.writer(buffer, delimiter=delimiter, quotechar='"', quoting=csv.QUOTE_MINIMAL,
+                            lineterminator=lineterminator)
+    for row in rows:
+        csv_writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+class FoldManifest(object):
+    """Cross eval folds stored as one data file plus the row numbers of every fold's dev rows.
+
+    `<name>.folds.data` holds every row once, encoded as it appears in the materialized fold files,
+    `<name>.folds.offsets.npy` the byte offset of each row and `fold_<k>/<name>.dev_rows.npy` the rows of the
+    dev split of fold k, its train split being every other row. `<name>.folds.json` ties them together with
+    the header and file names of the fold files `materialize` writes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.root = os.path.dirname(path)
+        manifest = utils.read_json(path)
+        self.name = manifest["name"]
+        self.num_folds = manifest["num_folds"]
+        self.header = manifest["header"]
+        self.files = manifest["files"]
+        self.delimiter = manifest["delimiter"]
+        self.offsets = np.load(self.file_path("{}.folds.offsets.npy".format(self.name)), mmap_mode="r")
+        self._data = None
+
+    @property
+    def num_rows(self):
+        return len(self.offsets) - 1
+
+    @staticmethod
+    def default_path(output_dir, name):
+        return os.path.join(output_dir, "{}.folds.json".format(name))
+
+    def file_path(self, name):
+        return os.path.join(self.root, name)
+
+    @classmethod
+    def write(cls, output_dir, name, rows, dev_rows, files, header=None, delimiter=None):
+        """Write the text `rows` once with the `dev_rows` index arrays of every fold and return the manifest.
+
+        `files` names the train and dev files of a materialized fold, `delimiter` is the csv delimiter of rows
+        that are csv records and None for plain lines.
+        """
+        offsets = [0]
+        with open(utils.ensure_path(os.path.join(output_dir, "{}.folds.data".format(name))), "wb") as f:
+            for row in rows:
+                offsets.append(offsets[-1] + f.write(row.encode("utf-8")))
+        np.save(os.path.join(output_dir, "{}.folds.offsets.npy".format(name)), np.array(offsets, dtype=np.int64))
+        for fold, rows_index in enumerate(dev_rows, 1):
+            rows_path = os.path.join(output_dir, "fold_{}".format(fold), "{}.dev_rows.npy".format(name))
+            np.save(utils.ensure_path(rows_path), np.asarray(rows_index, dtype=np.int64))
+        path = cls.default_path(output_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"name": name, "num_folds": len(dev_rows), "header": header,
+                       "files": dict(zip(FOLD_SPLITS, files)), "delimiter": delimiter}, f, indent=2)
+        return cls(path)
+
+    def data(self):
+        if self._data is None:
+            with open(self.file_path("{}.folds.data".format(self.name)), "rb") as f:
+                # an empty file can not be mapped
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.num_rows > 0 else b""
+        return self._data
+
+    def fold_rows(self, fold, split):
+        """Row numbers of the `split` of `fold`, folds being numbered from 1 like their directories."""
+        assert split in FOLD_SPLITS
+        dev_rows = np.load(os.path.join(self.root, "fold_{}".format(fold), "{}.dev_rows.npy".format(self.name)))
+        if split == "dev":
+            return dev_rows
+        is_train = np.ones(self.num_rows, dtype=bool)
+        is_train[dev_rows] = False
+        return np.flatnonzero(is_train)
+
+    def iter_raw_rows(self, fold, split):
+        """Encoded rows of the `split` of `fold`, sliced from the mapped data file."""
+        data, offsets = self.data(), self.offsets
+        for row in self.fold_rows(fold, split):
+            yield data[offsets[row]: offsets[row + 1]]
+
+    def iter_rows(self, fold, split):
+        """Rows of the `split` of `fold`, parsed to lists of fields for csv data and to strings for lines."""
+        for raw_row in self.iter_raw_rows(fold, split):
+            text = str(raw_row, "utf-8")
+            if self.delimiter is None:
+                yield text[:-1]
+            else:
+                yield next(csv.reader(io.StringIO(text, newline=""), delimiter=self.delimiter, quotechar='"'))
+
+    def materialize(self, output_dir=None):
+        """Write the fold files of every fold under `output_dir`, the manifest directory by default."""
+        output_dir = output_dir if output_dir is not None else self.root
+        for fold in range(1, self.num_folds + 1):
+            print("Materializing fold {} at {}".format(fold, output_dir))
+            for split in FOLD_SPLITS:
+                fold_path = os.path.join(output_dir, "fold_{}".format(fold), self.files[split])
+                with open(utils.ensure_path(fold_path), "wb") as f:
+                    if self.header is not None:
+                        f.write(self.header.encode("utf-8"))
+                    f.writelines(self.iter_raw_rows(fold, split))
@@ -3,7 +3,8 @@ import ntpath
 import operator
 import os
 import pandas as pd
-from preprocessing.dataset import StanceDataset
+from preprocessing.dataset import BaseDataset, CompactLabelSet, StanceDataset
+from preprocessing.fold_manifest import FoldManifest, encode_csv_rows
 from sklearn.model_selection import train_test_split
 from sklearn.model_selection import KFold
 import utils
@@ -168,8 +169,7 @@ def process_sentiment_annotated_dataset(annotated_path, cleaning=True):
     filtered_comment_df["source"] = filtered_comment_df["source"] \
         .map(lambda x: utils.simple_clean(x))
     if cleaning:
-        filtered_comment_df["source"] = filtered_comment_df["source"] \
-            .map(lambda x: utils.clean_tweet_text(x))
+        filtered_comment_df["source"] = utils.clean_tweet_texts(filtered_comment_df["source"])
     filtered_comment_df = filtered_comment_df[["source", "sentiment"]]
     return filtered_comment_df
 
@@ -189,8 +189,7 @@ def process_stance_annotated_dataset(annotated_path, cleaning=True):
     filtered_clean_df["target"] = filtered_clean_df["target"] \
         .map(lambda x: utils.simple_clean(x))
     if cleaning:
-        filtered_clean_df["source"] = filtered_clean_df["source"] \
-            .map(lambda x: utils.clean_tweet_text(x))
+        filtered_clean_df["source"] = utils.clean_tweet_texts(filtered_clean_df["source"])
     filtered_clean_df = filtered_clean_df[["source", "target", "stance"]]
     return filtered_clean_df
 
@@ -209,7 +208,17 @@ def post_process_sentiment_annotated_dataset(df):
     return final_df
 
 
-def process_text_classification(stance_path, stance_dataset_dir, label_type="stance", dataset_name="data"):
+def process_text_classification(stance_path, stance_dataset_dir, label_type="stance", dataset_name="data",
+                                output_format="tsv"):
+    """Split the rows with non empty texts of `stance_path` into train and test files.
+
+    `stance_path` is a TSV file or a binary dataset written by BaseDataset.export_binary. With `output_format`
+    "binary" the train split is written as a binary dataset for cross_val, the test split is always TSV.
+    """
+    if BaseDataset.is_binary(stance_path) or output_format == "binary":
+        if label_type != "stance":
+            raise ValueError("Binary datasets only hold stance rows, not {}".format(label_type))
+        return process_stance_dataset(stance_path, stance_dataset_dir, dataset_name, output_format)
     stance_dataset = utils.read_csv(stance_path, delimiter="\t")
     content_out = []
     for row in stance_dataset:
@@ -227,14 +236,57 @@ def process_text_classification(stance_path, stance_dataset_dir, label_type="sta
     return train_path, test_path
 
 
-def cross_val(input_path, output_dir, num_folds, dataset_name="data"):
+def process_stance_dataset(stance_path, stance_dataset_dir, dataset_name="data", output_format="tsv"):
+    """process_text_classification of stance rows read from and written to binary datasets."""
+    if BaseDataset.is_binary(stance_path):
+        stance_dataset = BaseDataset.load_binary(stance_path)
+        pool = stance_dataset.feature_set.pool
+        blank_ids = [string_id for string_id in range(len(pool)) if len(pool[string_id].strip()) == 0]
+        sources, targets = stance_dataset.feature_set.sources, stance_dataset.feature_set.targets
+        kept_rows = np.flatnonzero(~np.isin(sources, blank_ids) & ~np.isin(targets, blank_ids))
+        label_set = stance_dataset.label_set
+        stance_dataset.label_set = CompactLabelSet.from_buffers([label.rstrip() for label in label_set.vocabulary],
+                                                                label_set.codes)
+    else:
+        rows = [row for row in utils.read_csv(stance_path, delimiter="\t")
+                if len(row[1].strip()) > 0 and len(row[2].strip()) > 0]
+        stance_dataset = BaseDataset([row[1:3] for row in rows], [row[3].rstrip() for row in rows],
+                                     idxs=[row[0] for row in rows], validate="off")
+        kept_rows = np.arange(len(rows))
+    train_rows, test_rows = train_test_split(kept_rows, test_size=0.05, random_state=9)
+    test_path = os.path.join(stance_dataset_dir, "{}.test".format(dataset_name))
+    utils.write_csv(stance_dataset.iter_records(rows=test_rows), None, test_path, delimiter="\t")
+    if output_format == "binary":
+        train_path = os.path.join(stance_dataset_dir, "{}_all.dataset".format(dataset_name))
+        stance_dataset.export_binary(train_path, rows=train_rows)
+    else:
+        train_path = os.path.join(stance_dataset_dir, "{}_all.train".format(dataset_name))
+        utils.write_csv(stance_dataset.iter_records(rows=train_rows), None, train_path, delimiter="\t")
+    return train_path, test_path
+
+
+def load_lines(input_path):
+    """Lines of a text file, or the records of a binary dataset written by BaseDataset.export_binary as TSV lines."""
+    if BaseDataset.is_binary(input_path):
+        return list(encode_csv_rows(BaseDataset.load_binary(input_path).iter_records(), "\t", lineterminator=""))
+    return utils.load_text_as_list(input_path)
+
+
+def cross_val(input_path, output_dir, num_folds, dataset_name="data", manifest=False):
+    """Split the lines of `input_path` in `num_folds` train and val files, a binary dataset record by record."""
     kf = KFold(n_splits=num_folds)
-    data = np.array(utils.load_text_as_list(input_path))
+    data = load_lines(input_path)
+    if manifest:
+        print("Creating fold manifest at {}".format(output_dir))
+        FoldManifest.write(output_dir, dataset_name, ("{}\n".format(line) for line in data),
+                           [test_index for _, test_index in kf.split(np.arange(len(data)))],
+                           ["{}.train".format(dataset_name), "{}.val".format(dataset_name)])
+        return
     fold = 1
-    for train_index, test_index in kf.split(data):
+    for train_index, test_index in kf.split(np.arange(len(data))):
         fold_dir = os.path.join(output_dir, "fold_{}".format(fold))
         print("Creating fold {} at {}".format(fold, output_dir))
-        data_train, data_test = data[train_index], data[test_index]
+        data_train, data_test = (data[i] for i in train_index), (data[i] for i in test_index)
         utils.save_list_as_text(data_train, utils.ensure_path(os.path.join(fold_dir, "{}.train".format(dataset_name))))
         utils.save_list_as_text(data_test, utils.ensure_path(os.path.join(fold_dir, "{}.val".format(dataset_name))))
         fold += 1
@@ -0,0 +1,179 @@
+import io
+import os
+import sqlite3
+import threading
+import utils
+
+PACKED_STORE_NAME = "packed.sqlite"
+
+
+class FileTree(object):
+    """Dataset tree read straight from the filesystem, one file at a time."""
+
+    @staticmethod
+    def listdir(path):
+        return os.listdir(path)
+
+    @staticmethod
+    def isdir(path):
+        return os.path.isdir(path)
+
+    @staticmethod
+    def isfile(path):
+        return os.path.isfile(path)
+
+    @staticmethod
+    def getmtime(path):
+        return os.path.getmtime(path)
+
+    @staticmethod
+    def read_json(path, fields=None):
+        return utils.read_json(path, fields)
+
+    @staticmethod
+    def read_jsons(directory, names=None, fields=None):
+        """Documents of the `names` files of `directory`, every file in listing order by default."""
+        names = names if names is not None else os.listdir(directory)
+        return [utils.read_json(os.path.join(directory, name), fields) for name in names]
+
+    @staticmethod
+    def read_text(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+
+FILE_TREE = FileTree()
+
+
+class PackedTree(object):
+    """Dataset tree packed by `pack` into a single SQLite store, read with one query per directory.
+
+    Entries are keyed by their parent directory and name relative to the packed `root`, keep the listing order and
+    modification times of the tree they come from, and are clustered by directory so reading every tweet of a news
+    or discourse is a single sequential scan. Paths given to the readers are the same paths under `root` the
+    loaders use on the filesystem.
+    """
+
+    def __init__(self, path, root):
+        self.path = path
+        self.root = root
+        self._local = threading.local()
+
+    def __getstate__(self):
+        return {"path": self.path, "root": self.root}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["root"])
+
+    @staticmethod
+    def default_path(root):
+        return os.path.join(root, PACKED_STORE_NAME)
+
+    @classmethod
+    def pack(cls, root, subtrees, path=None, batch_size=10000):
+        """Pack the `subtrees` directories of `root`, given relative to it, into a new store and return its size."""
+        path = path if path is not None else cls.default_path(root)
+        connection = sqlite3.connect(utils.ensure_path(path + ".tmp"))
+        connection.execute("DROP TABLE IF EXISTS entries")
+        connection.execute("CREATE TABLE entries (parent TEXT NOT NULL, position INTEGER NOT NULL, name TEXT NOT NULL, "
+                           "is_dir INTEGER NOT NULL, mtime REAL NOT NULL, content BLOB, "
+                           "PRIMARY KEY (parent, position)) WITHOUT ROWID")
+        num_entries, rows, packed_dirs = 0, [], set()
+
+        def add_entry(parent, position, name):
+            full_path = os.path.join(root, parent, name)
+            is_dir = os.path.isdir(full_path)
+            content = None
+            if not is_dir:
+                with open(full_path, "rb") as f:
+                    content = f.read()
+            rows.append((parent, position, name, int(is_dir), os.path.getmtime(full_path), content))
+            if len(rows) >= batch_size:
+                connection.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows)
+                del rows[:]
+            return is_dir
+
+        for subtree in subtrees:
+            parts = os.path.normpath(subtree).split(os.sep)
+            # the ancestors of a subtree are packed as directories so that they can be listed and stat
+            for depth in range(len(parts)):
+                parent, name = "/".join(parts[:depth]), parts[depth]
+                if (parent, name) not in packed_dirs:
+                    position = os.listdir(os.path.join(root, parent)).index(name)
+                    add_entry(parent, position, name)
+                    packed_dirs.add((parent, name))
+            stack = ["/".join(parts)]
+            while len(stack) > 0:
+                directory = stack.pop()
+                for position, name in enumerate(os.listdir(os.path.join(root, directory))):
+                    num_entries += 1
+                    if add_entry(directory, position, name):
+                        stack.append("/".join([directory, name]))
+        connection.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows)
+        connection.execute("CREATE UNIQUE INDEX entries_name ON entries (parent, name)")
+        connection.commit()
+        connection.close()
+        os.replace(path + ".tmp", path)
+        return num_entries
+
+    def connection(self):
+        # one connection per thread and per process, sqlite connections cannot be shared across either
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.connection = sqlite3.connect("file:{}?mode=ro".format(self.path), uri=True)
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def key(self, path):
+        key = os.path.relpath(path, self.root).replace(os.sep, "/")
+        return "" if key == "." else key
+
+    def entry(self, path):
+        key = self.key(path)
+        if key == "":
+            return 1, None, None
+        parent, _, name = key.rpartition("/")
+        return self.connection().execute("SELECT is_dir, mtime, content FROM entries WHERE parent = ? AND name = ?",
+                                         (parent, name)).fetchone()
+
+    def listdir(self, path):
+        entry = self.entry(path)
+        if entry is None or not entry[0]:
+            raise FileNotFoundError("No packed directory {}".format(path))
+        rows = self.connection().execute("SELECT name FROM entries WHERE parent = ? ORDER BY position",
+                                         (self.key(path),))
+        return [name for name, in rows]
+
+    def isdir(self, path):
+        entry = self.entry(path)
+        return entry is not None and entry[0] == 1
+
+    def isfile(self, path):
+        entry = self.entry(path)
+        return entry is not None and entry[0] == 0
+
+    def getmtime(self, path):
+        entry = self.entry(path)
+        if entry is None:
+            raise FileNotFoundError("No packed entry {}".format(path))
+        return entry[1]
+
+    def read_bytes(self, path):
+        entry = self.entry(path)
+        if entry is None or entry[0]:
+            raise FileNotFoundError("No packed file {}".format(path))
+        return entry[2]
+
+    def read_json(self, path, fields=None):
+        return utils.parse_json(self.read_bytes(path), fields)
+
+    def read_jsons(self, directory, names=None, fields=None):
+        rows = self.connection().execute("SELECT name, content FROM entries WHERE parent = ? AND is_dir = 0 "
+                                         "ORDER BY position", (self.key(directory),)).fetchall()
+        if names is None:
+            return [utils.parse_json(content, fields) for _, content in rows]
+        contents = dict(rows)
+        return [utils.parse_json(contents[name], fields) for name in names]
+
+    def read_text(self, path):
+        # decoded like a file opened in text mode, with universal newlines
+        return io.TextIOWrapper(io.BytesIO(self.read_bytes(path)), encoding="utf-8").read()
@@ -0,0 +1,101 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+import utils
+from preprocessing.dataset_loader import RumorEval17
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves "/old" as a redirect to "/new" and a titled page for every other path."""
+
+    def do_GET(self):
+        self.server.requested.append(self.path)
+        if self.path == "/old":
+            self.send_response(301)
+            self.send_header("Location", "/new")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.end_headers()
+        self.wfile.write("<html><head><title>{} headline - Some Media</title></head></html>"
+                         .format(self.path.strip("/").capitalize()).encode("utf-8"))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.requested = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def url(self, path):
+        return "http://127.0.0.1:{}{}".format(self.server.server_port, path)
+
+
+class AsyncHeadlineCrawlerTest(StubServerTestCase):
+
+    def test_follows_redirects(self):
+        results = {}
+        crawler = utils.AsyncHeadlineCrawler(host_interval=0.0, backoff=0.0)
+        crawler.crawl([("1", self.url("/old"))], lambda key, url, result: results.update({key: result}))
+        self.assertEqual(results, {"1": ("New headline", " Some Media")})
+        self.assertEqual(self.server.requested, ["/old", "/new"])
+
+
+class CrawlHeadlinesTest(StubServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.re_root = tempfile.mkdtemp()
+        self.loader = RumorEval17(self.re_root)
+        self.write_urls([("u1", self.url("/first")), ("u2", self.url("/second"))])
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.re_root)
+
+    def write_urls(self, urls):
+        url_data = os.path.join(self.loader.re_data, "topic", "1", "urls.dat")
+        with open(utils.ensure_path(url_data), "w", encoding="utf-8") as f:
+            for url_id, url in urls:
+                f.write("{}\t{}\t{}\n".format(url_id, url, url))
+
+    def test_resumes_from_partial(self):
+        with open(self.loader.headline_csv + ".partial", "w", encoding="utf-8", newline="") as f:
+            f.write(",".join(RumorEval17.HEADLINE_HEADER) + "\r\n")
+            f.write("u1,{},First headline, Some Media,1\r\n".format(self.url("/first")))
+        self.loader.crawl_headlines(host_interval=0.0)
+        self.assertEqual(self.server.requested, ["/second"])
+        self.assertFalse(os.path.isfile(self.loader.headline_csv + ".partial"))
+        self.assertEqual(self.loader.load_headlines(), {"u1": "First headline", "u2": "Second headline"})
+
+    def test_keeps_partial_with_failed_urls(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            unreachable_url = "http://127.0.0.1:{}/third".format(s.getsockname()[1])
+        self.write_urls([("u1", self.url("/first")), ("u3", unreachable_url)])
+        self.assertEqual(self.loader.crawl_headlines(host_interval=0.0, retries=0), 1)
+        self.assertFalse(os.path.isfile(self.loader.headline_csv))
+        self.assertTrue(os.path.isfile(self.loader.headline_csv + ".partial"))
+
+        self.server.requested = []
+        self.write_urls([("u1", self.url("/first")), ("u3", self.url("/third"))])
+        self.assertEqual(self.loader.crawl_headlines(host_interval=0.0, retries=0), 0)
+        self.assertEqual(self.server.requested, ["/third"])
+        self.assertEqual(self.loader.load_headlines(), {"u1": "First headline", "u3": "Third headline"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,8 @@
+from .cache import *
 from .io import *
+from .lcs import *
 from .ml import *
 from .nlp import *
+from .parallel import *
+from .segmentation import *
 from .web import *
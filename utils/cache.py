@@ -0,0 +1,111 @@
+from collections import OrderedDict
+import atexit
+import hashlib
+import os
+import sqlite3
+import utils.io as utils_io
+
+
+class TextCache(object):
+    """Memoizes a text -> text function with an in-process LRU tier and an optional SQLite tier.
+
+    Entries are keyed by a hash of the input text and `version`, so bumping the version of the
+    cached function invalidates everything it stored before.
+    """
+
+    def __init__(self, version, path=None, max_size=100000, flush_every=1000):
+        self.version = version
+        self.path = path
+        self.max_size = max_size
+        self.flush_every = flush_every
+        self.memory = OrderedDict()
+        self.pending = []
+        self.hits, self.disk_hits, self.misses = 0, 0, 0
+        self._connection = None
+        self._pid = None
+        self._owner_pid = os.getpid()
+        # (text, value) pairs put while recording, returned by worker processes to the owner of the store
+        self.recorded = None
+        atexit.register(self.flush)
+
+    def configure(self, path=None, max_size=None):
+        self.close()
+        self.path = path
+        self._owner_pid = os.getpid()
+        if max_size is not None:
+            self.max_size = max_size
+            self.memory.clear()
+
+    def key(self, text):
+        return hashlib.sha1("{}\0{}".format(self.version, text).encode("utf-8")).hexdigest()
+
+    def connection(self):
+        # forked worker processes only use the memory tier, the process that configured the cache owns the store
+        if self.path is None or self._owner_pid != os.getpid():
+            return None
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(utils_io.ensure_path(self.path), timeout=60)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT)")
+            self._pid = os.getpid()
+            self.pending = []
+        return self._connection
+
+    def get(self, text):
+        key = self.key(text)
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return self.memory[key]
+        connection = self.connection()
+        if connection is not None:
+            row = connection.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.disk_hits += 1
+                self._remember(key, row[0])
+                return row[0]
+        self.misses += 1
+        return None
+
+    def put(self, text, value):
+        key = self.key(text)
+        self._remember(key, value)
+        if self.recorded is not None:
+            self.recorded.append((text, value))
+        if self.connection() is not None:
+            self.pending.append((key, value))
+            if len(self.pending) >= self.flush_every:
+                self.flush()
+
+    def remember(self, pairs):
+        """Keep (text, value) `pairs` looked up by another process in the memory tier only."""
+        for text, value in pairs:
+            self._remember(self.key(text), value)
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.max_size:
+            self.memory.popitem(last=False)
+
+    def flush(self):
+        if self._connection is None or self._pid != os.getpid() or len(self.pending) == 0:
+            return
+        with self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)", self.pending)
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups > 0 else 0.0,
+            "memory_size": len(self.memory)
+        }
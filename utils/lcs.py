@@ -0,0 +1,92 @@
+from collections import Counter
+from functools import lru_cache
+
+
+class SuffixAutomaton(object):
+    """Suffix automaton of a source text for repeated longest common substring queries.
+
+    `longest_common_substring` returns exactly what difflib.SequenceMatcher(None, target, source)
+    .find_longest_match gives over the full ranges, including the autojunk heuristic which ignores
+    characters that are too frequent in sources of 200 characters or more.
+    """
+
+    def __init__(self, text, autojunk=True):
+        self.text = text
+        self.transitions = [{}]
+        self.links = [-1]
+        self.lengths = [0]
+        self.first_ends = [-1]
+        last = 0
+        for position, char in enumerate(text):
+            last = self._extend(last, char, position)
+        self.popular = set()
+        if autojunk and len(text) >= 200:
+            popular_threshold = len(text) // 100 + 1
+            self.popular = {char for char, count in Counter(text).items() if count > popular_threshold}
+
+    def _add_state(self, length, link, first_end, transitions):
+        self.transitions.append(transitions)
+        self.links.append(link)
+        self.lengths.append(length)
+        self.first_ends.append(first_end)
+        return len(self.lengths) - 1
+
+    def _extend(self, last, char, position):
+        transitions, links, lengths = self.transitions, self.links, self.lengths
+        current = self._add_state(lengths[last] + 1, -1, position, {})
+        state = last
+        while state != -1 and char not in transitions[state]:
+            transitions[state][char] = current
+            state = links[state]
+        if state == -1:
+            links[current] = 0
+            return current
+        next_state = transitions[state][char]
+        if lengths[state] + 1 == lengths[next_state]:
+            links[current] = next_state
+            return current
+        clone = self._add_state(lengths[state] + 1, links[next_state], self.first_ends[next_state],
+                                dict(transitions[next_state]))
+        while state != -1 and transitions[state].get(char) == next_state:
+            transitions[state][char] = clone
+            state = links[state]
+        links[next_state] = clone
+        links[current] = clone
+        return current
+
+    def find_longest_match(self, target):
+        """Return (target_start, source_start, size) like SequenceMatcher.find_longest_match."""
+        transitions, links, lengths, popular = self.transitions, self.links, self.lengths, self.popular
+        source = self.text
+        best_i, best_j, best_size = 0, 0, 0
+        state, length = 0, 0
+        for i, char in enumerate(target):
+            if char in popular:
+                state, length = 0, 0
+                continue
+            while state != 0 and char not in transitions[state]:
+                state = links[state]
+                length = lengths[state]
+            if char in transitions[state]:
+                state = transitions[state][char]
+                length += 1
+            else:
+                state, length = 0, 0
+            if length > best_size:
+                best_i, best_j, best_size = i - length + 1, self.first_ends[state] - length + 1, length
+
+        while best_i > 0 and best_j > 0 and target[best_i - 1] == source[best_j - 1]:
+            best_i, best_j, best_size = best_i - 1, best_j - 1, best_size + 1
+        while best_i + best_size < len(target) and best_j + best_size < len(source) \
+                and target[best_i + best_size] == source[best_j + best_size]:
+            best_size += 1
+        return best_i, best_j, best_size
+
+    def longest_common_substring(self, target):
+        target_start, _, size = self.find_longest_match(target)
+        return target[target_start: target_start + size]
+
+
+@lru_cache(maxsize=1024)
+def suffix_automaton(text):
+    return SuffixAutomaton(text)
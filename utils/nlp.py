@@ -1,17 +1,204 @@
-from difflib import SequenceMatcher
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import atexit
+import json
+import multiprocessing
+import os
+import pickle
 import preprocessor as p
+from preprocessor.defines import Patterns
 import re
 import string
-import wordninja
+import time
+from prettytable import PrettyTable
+from utils.cache import TextCache
 import utils.io as utils_io
+from utils.lcs import suffix_automaton
+from utils.segmentation import WordSegmenter
 
+# bump whenever clean_tweet_text changes its output so that cached results are invalidated
+CLEANER_VERSION = "1"
 
-COMMON_ENGLISH_WORDS = utils_io.load_text_as_list("datasets/common_20k.txt")
+
+class VocabularyIndex(object):
+    """Hashed word set read from a one-word-per-line file on first lookup.
+
+    A precompiled pickle of the set is used instead of the text file when it exists and is
+    newer than the text file, see `compile`.
+    """
+
+    def __init__(self, path, compiled_path=None):
+        self.path = path
+        self.compiled_path = compiled_path if compiled_path is not None else "{}.pkl".format(path)
+        self._words = None
+
+    @property
+    def words(self):
+        if self._words is None:
+            self._words = self.load()
+        return self._words
+
+    def is_compiled(self):
+        if not os.path.isfile(self.compiled_path):
+            return False
+        return not os.path.isfile(self.path) or os.path.getmtime(self.compiled_path) >= os.path.getmtime(self.path)
+
+    def load(self):
+        if self.is_compiled():
+            with open(self.compiled_path, "rb") as f:
+                return pickle.load(f)
+        return frozenset(utils_io.load_text_as_list(self.path))
+
+    def compile(self):
+        self._words = frozenset(utils_io.load_text_as_list(self.path))
+        with open(utils_io.ensure_path(self.compiled_path), "wb") as f:
+            pickle.dump(self._words, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return self.compiled_path
+
+    def __contains__(self, word):
+        return word in self.words
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __len__(self):
+        return len(self.words)
+
+
+class CleaningStats(object):
+    """Cumulative time and call count per stage of clean_tweet_text, plus a histogram of input lengths.
+
+    Lengths are bucketed by the next power of two, e.g. the bucket 64 counts texts of 33 to 64 characters.
+    """
+
+    def __init__(self):
+        self.seconds = Counter()
+        self.calls = Counter()
+        self.length_histogram = Counter()
+
+    def record(self, stage, seconds, calls=1):
+        self.seconds[stage] += seconds
+        self.calls[stage] += calls
+
+    def observe_length(self, length):
+        self.length_histogram[1 << (length - 1).bit_length() if length > 0 else 0] += 1
+
+    def merge(self, stats_dict):
+        for stage, stage_stats in stats_dict["stages"].items():
+            self.record(stage, stage_stats["seconds"], stage_stats["calls"])
+        for bucket, count in stats_dict["length_histogram"].items():
+            self.length_histogram[int(bucket)] += count
+
+    def reset(self):
+        self.seconds.clear()
+        self.calls.clear()
+        self.length_histogram.clear()
+
+    def to_dict(self):
+        return {
+            "stages": {stage: {"seconds": self.seconds[stage], "calls": self.calls[stage]} for stage in self.calls},
+            "length_histogram": {str(bucket): self.length_histogram[bucket]
+                                 for bucket in sorted(self.length_histogram)}
+        }
+
+    def to_json(self, path):
+        with open(utils_io.ensure_path(path), "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def report(self):
+        total_seconds = self.seconds["total"]
+        stage_table = PrettyTable(["stage", "seconds", "calls", "share"])
+        for stage, seconds in self.seconds.most_common():
+            share = seconds / total_seconds if total_seconds > 0 else 0.0
+            stage_table.add_row([stage, "{:.4f}".format(seconds), self.calls[stage], "{:.1%}".format(share)])
+        length_table = PrettyTable(["input length <=", "texts"])
+        for bucket in sorted(self.length_histogram):
+            length_table.add_row([bucket, self.length_histogram[bucket]])
+        return "{}\n{}".format(stage_table, length_table)
+
+
+class _TimedStage(object):
+    """Proxy that times the vocabulary lookups or segmentations made through it."""
+
+    def __init__(self, wrapped, stats, stage):
+        self.wrapped = wrapped
+        self.stats = stats
+        self.stage = stage
+
+    def __contains__(self, word):
+        start = time.perf_counter()
+        contained = word in self.wrapped
+        self.stats.record(self.stage, time.perf_counter() - start)
+        return contained
+
+    def segment(self, word):
+        start = time.perf_counter()
+        segments = self.wrapped.segment(word)
+        self.stats.record(self.stage, time.perf_counter() - start)
+        return segments
+
+    def segment_many(self, words):
+        start = time.perf_counter()
+        segments = self.wrapped.segment_many(words)
+        self.stats.record(self.stage, time.perf_counter() - start)
+        return segments
+
+
+COMMON_ENGLISH_WORDS = VocabularyIndex("datasets/common_20k.txt")
+CLEANING_STATS = CleaningStats()
+CLEAN_CACHE = TextCache(CLEANER_VERSION)
+WORD_SEGMENTER = WordSegmenter()
+CLEAN_WORKERS = 1
+CLEAN_CHUNK_SIZE = 500
+_CLEAN_EXECUTOR = None
+
+
+def configure_clean_cache(path=None, max_size=None):
+    """Set the on-disk store of the clean_tweet_text cache, None keeps it in memory only."""
+    CLEAN_CACHE.configure(path, max_size)
+
+
+def enable_cleaning_stats(enabled=True):
+    """Turn per-stage instrumentation of clean_tweet_text on or off, results go to CLEANING_STATS."""
+    # running workers were forked with the previous setting
+    shutdown_clean_executor()
+    TWEET_REWRITER.stats = CLEANING_STATS if enabled else None
+
+
+def configure_clean_workers(num_workers=None, chunk_size=None):
+    """Set the default process pool size and chunk size of clean_tweet_texts."""
+    global CLEAN_WORKERS, CLEAN_CHUNK_SIZE
+    shutdown_clean_executor()
+    CLEAN_WORKERS = max(1, num_workers if num_workers is not None else os.cpu_count())
+    if chunk_size is not None:
+        CLEAN_CHUNK_SIZE = chunk_size
+
+
+def _clean_executor(num_workers):
+    global _CLEAN_EXECUTOR
+    if _CLEAN_EXECUTOR is not None and _CLEAN_EXECUTOR[0] != num_workers:
+        shutdown_clean_executor()
+    if _CLEAN_EXECUTOR is None:
+        # load the vocabulary once so that forked workers inherit it
+        len(COMMON_ENGLISH_WORDS)
+        _CLEAN_EXECUTOR = (num_workers, ProcessPoolExecutor(max_workers=num_workers,
+                                                             mp_context=multiprocessing.get_context("fork")))
+    return _CLEAN_EXECUTOR[1]
+
+
+@atexit.register
+def shutdown_clean_executor():
+    global _CLEAN_EXECUTOR
+    if _CLEAN_EXECUTOR is not None:
+        _CLEAN_EXECUTOR[1].shutdown()
+        _CLEAN_EXECUTOR = None
+
+
+URL_REGEX = re.compile('((https?):((//)|(\\\\))+([\w\d:#@%/;$()“”~_?\+-=\\\.&](#!)?)*)', re.DOTALL)
 
 
 def strip_urls(text):
-    url_regex = re.compile('((https?):((//)|(\\\\))+([\w\d:#@%/;$()“”~_?\+-=\\\.&](#!)?)*)', re.DOTALL)
-    urls = re.findall(url_regex, text)
+    urls = re.findall(URL_REGEX, text)
     for url in urls:
         text = text.replace(url[0], ', ')
     return text
@@ -39,42 +226,251 @@ def simple_clean(text):
     return str(text).lower().replace("\n", " ").replace("\t", " ").strip().rstrip()
 
 
-def clean_tweet_text(tweet_text): 
-    tweet_text = tweet_text.replace("’", "'").replace("…", "...")
-    tweet_parser = p.parse(tweet_text)
-    cleaned_tweet = tweet_text
-    hash_tags = tweet_parser.hashtags
-    if hash_tags is not None:
-        for hash_tag in hash_tags:
-            cleaned_tweet = cleaned_tweet.replace(hash_tag.match, " ".join(wordninja.split(hash_tag.match[1:])))
-    tweet_urls = tweet_parser.urls
-    if tweet_urls is not None:
-        for url_link in tweet_urls:
-            cleaned_tweet = cleaned_tweet.replace(url_link.match, " url$$ ")
-    tweet_emojis = tweet_parser.emojis
-    if tweet_emojis is not None:
-        for emoji in tweet_emojis:
-            cleaned_tweet = cleaned_tweet.replace(emoji.match, " emoji$$ ")
-    cleaned_tweet = cleaned_tweet.split("via")[0].split("|")[0].split(" - ")[0].split(" – ")[0]
-    cleaned_tweet_tokens = []
-    for word_token in cleaned_tweet.split(" "):
-        word_token = word_token.strip().rstrip()
-        if word_token.endswith("$$") or word_token in COMMON_ENGLISH_WORDS:
-            cleaned_tweet_tokens.append(word_token)
-        elif len(word_token) > 0:
-            split_tokens = [w for w in wordninja.split(word_token) if w not in string.punctuation]
-            cleaned_tweet_tokens += [token for token in split_tokens if not is_number(token)]
-
-    cleaned_tweet = " ".join(cleaned_tweet_tokens)
+def clean_tweet_text(tweet_text):
+    cleaned_tweet = CLEAN_CACHE.get(tweet_text)
+    if cleaned_tweet is None:
+        cleaned_tweet = _clean_tweet_text(tweet_text)
+        CLEAN_CACHE.put(tweet_text, cleaned_tweet)
     return cleaned_tweet
 
 
+def clean_tweet_texts(tweet_texts, num_workers=None, chunk_size=None):
+    """Clean a batch of texts, returning the results in input order.
+
+    Duplicates and cached texts are cleaned once, the rest is split into chunks of `chunk_size`
+    and cleaned by a pool of `num_workers` forked processes when there is more than one chunk.
+    """
+    tweet_texts = list(tweet_texts)
+    num_workers = num_workers if num_workers is not None else CLEAN_WORKERS
+    chunk_size = chunk_size if chunk_size is not None else CLEAN_CHUNK_SIZE
+    cleaned_map, uncleaned = {}, []
+    for tweet_text in OrderedDict.fromkeys(tweet_texts):
+        cleaned_tweet = CLEAN_CACHE.get(tweet_text)
+        if cleaned_tweet is None:
+            uncleaned.append(tweet_text)
+        else:
+            cleaned_map[tweet_text] = cleaned_tweet
+
+    # workers inherit the vocabulary, segmenter and stats by fork, without it texts are cleaned serially
+    if num_workers > 1 and len(uncleaned) > chunk_size and "fork" in multiprocessing.get_all_start_methods():
+        chunks = [uncleaned[i:i + chunk_size] for i in range(0, len(uncleaned), chunk_size)]
+        cleaned = []
+        for cleaned_chunk, chunk_stats in _clean_executor(num_workers).map(_clean_tweet_chunk_in_worker, chunks):
+            cleaned += cleaned_chunk
+            if chunk_stats is not None:
+                CLEANING_STATS.merge(chunk_stats)
+    else:
+        cleaned = _clean_tweet_chunk(uncleaned)
+    for tweet_text, cleaned_tweet in zip(uncleaned, cleaned):
+        CLEAN_CACHE.put(tweet_text, cleaned_tweet)
+        cleaned_map[tweet_text] = cleaned_tweet
+    return [cleaned_map[tweet_text] for tweet_text in tweet_texts]
+
+
+def cached_cleanings(tweet_texts):
+    """(text, cleaned) pairs of the `tweet_texts` in the clean cache, looked up for a task of a worker process.
+
+    Workers only see the memory tier of the cache, the process owning its store looks the texts up for them.
+    """
+    cleanings = []
+    for tweet_text in OrderedDict.fromkeys(tweet_texts):
+        cleaned_tweet = CLEAN_CACHE.get(tweet_text)
+        if cleaned_tweet is not None:
+            cleanings.append((tweet_text, cleaned_tweet))
+    return cleanings
+
+
+def clean_with_cleanings(fn, task):
+    """Call fn(item) in a worker process for an (item, cleanings) `task`, cleanings coming from cached_cleanings.
+
+    Returns the result with the (text, cleaned) pairs cleaned by the call, for store_cleanings to cache.
+    """
+    item, cleanings = task
+    CLEAN_CACHE.remember(cleanings)
+    CLEAN_CACHE.recorded = []
+    try:
+        return fn(item), CLEAN_CACHE.recorded
+    finally:
+        CLEAN_CACHE.recorded = None
+
+
+def store_cleanings(cleanings):
+    for tweet_text, cleaned_tweet in cleanings:
+        CLEAN_CACHE.put(tweet_text, cleaned_tweet)
+
+
+def _clean_tweet_chunk(tweet_texts):
+    return [_clean_tweet_text(tweet_text) for tweet_text in tweet_texts]
+
+
+def _clean_tweet_chunk_in_worker(tweet_texts):
+    if TWEET_REWRITER.stats is None:
+        return _clean_tweet_chunk(tweet_texts), None
+    TWEET_REWRITER.stats = CleaningStats()
+    return _clean_tweet_chunk(tweet_texts), TWEET_REWRITER.stats.to_dict()
+
+
+def _clean_tweet_text(tweet_text):
+    return TWEET_REWRITER.clean(tweet_text)
+
+
+def _scoped_pattern(pattern):
+    """Source of a compiled pattern with its inline flags scoped, so it can be embedded in another pattern."""
+    source = re.sub(r"^\(\?[aiLmsux]+\)", "", pattern.pattern)
+    flags = "".join(flag for flag, value in [("i", re.IGNORECASE), ("m", re.MULTILINE), ("s", re.DOTALL),
+                                             ("x", re.VERBOSE)] if pattern.flags & value)
+    return "(?{}:{})".format(flags, source) if len(flags) > 0 else "(?:{})".format(source)
+
+
+class TweetRewriter(object):
+    """Single-pass version of the tweet cleaning pipeline.
+
+    Urls, hashtags and emojis are recognized by one scan over the text with tweet-preprocessor's own
+    patterns and rewritten as they are found, instead of being parsed first and then substituted with
+    one `str.replace` over the whole text per entity. When the text is ambiguous for a single pass, e.g.
+    a hashtag inside a url or an entity that also occurs as part of another one, the rewriter falls
+    back to the sequential substitutions so that the output is always the same.
+    """
+
+    ENTITY_REGEX = re.compile("(?P<url>{})|(?P<hashtag>{})|(?P<emoji>{})".format(
+        _scoped_pattern(Patterns.URL_PATTERN), _scoped_pattern(Patterns.HASHTAG_PATTERN),
+        _scoped_pattern(Patterns.EMOJIS_PATTERN)))
+    TRUNCATION_REGEX = re.compile("via|\\|| - | – ")
+    URL_CONTINUATIONS = ".-:/"
+    URL_TOKEN = " url$$ "
+    EMOJI_TOKEN = " emoji$$ "
+
+    def __init__(self, vocabulary, segmenter, stats=None):
+        self.vocabulary = vocabulary
+        self.segmenter = segmenter
+        self.stats = stats
+
+    @staticmethod
+    def normalize(tweet_text):
+        return tweet_text.replace("’", "'").replace("…", "...")
+
+    def rewrite(self, tweet_text, segmenter=None):
+        """Substitute entities in one scan, None if the result could differ from `rewrite_sequential`."""
+        segmenter = segmenter if segmenter is not None else self.segmenter
+        pieces, entity_counts = [], {}
+        num_hashtags, position = 0, 0
+        for match in self.ENTITY_REGEX.finditer(tweet_text):
+            start, end = match.span()
+            entity = match.group()
+            pieces.append(tweet_text[position:start])
+            if match.group("hashtag") is not None:
+                if end < len(tweet_text) and tweet_text[end] in self.URL_CONTINUATIONS \
+                        or Patterns.EMOJIS_PATTERN.search(entity) is not None:
+                    return None
+                num_hashtags += 1
+                entity_counts[entity] = entity_counts.get(entity, 0) + 1
+                pieces.append(" ".join(segmenter.segment(entity[1:])))
+            elif match.group("url") is not None:
+                entity_counts[entity] = entity_counts.get(entity, 0) + 1
+                pieces.append(self.URL_TOKEN)
+            else:
+                pieces.append(self.EMOJI_TOKEN)
+            position = end
+        pieces.append(tweet_text[position:])
+        # every entity must be replaced exactly where it was recognized, as str.replace would do
+        if num_hashtags != tweet_text.count("#"):
+            return None
+        for entity, count in entity_counts.items():
+            if tweet_text.count(entity) != count:
+                return None
+        return "".join(pieces)
+
+    def rewrite_sequential(self, tweet_text, segmenter=None):
+        segmenter = segmenter if segmenter is not None else self.segmenter
+        tweet_parser = p.parse(tweet_text)
+        cleaned_tweet = tweet_text
+        hash_tags = tweet_parser.hashtags
+        if hash_tags is not None:
+            for hash_tag in hash_tags:
+                cleaned_tweet = cleaned_tweet.replace(hash_tag.match,
+                                                      " ".join(segmenter.segment(hash_tag.match[1:])))
+        tweet_urls = tweet_parser.urls
+        if tweet_urls is not None:
+            for url_link in tweet_urls:
+                cleaned_tweet = cleaned_tweet.replace(url_link.match, self.URL_TOKEN)
+        tweet_emojis = tweet_parser.emojis
+        if tweet_emojis is not None:
+            for emoji in tweet_emojis:
+                cleaned_tweet = cleaned_tweet.replace(emoji.match, self.EMOJI_TOKEN)
+        return cleaned_tweet
+
+    def truncate(self, cleaned_tweet):
+        truncation = self.TRUNCATION_REGEX.search(cleaned_tweet)
+        return cleaned_tweet[:truncation.start()] if truncation is not None else cleaned_tweet
+
+    def tokens(self, cleaned_tweet, vocabulary=None, segmenter=None):
+        vocabulary = vocabulary if vocabulary is not None else self.vocabulary
+        segmenter = segmenter if segmenter is not None else self.segmenter
+        word_tokens = [word_token.strip().rstrip() for word_token in cleaned_tweet.split(" ")]
+        is_kept = [word_token.endswith("$$") or word_token in vocabulary for word_token in word_tokens]
+        # every out of vocabulary token of the tweet is segmented in one batch
+        segmented = iter(segmenter.segment_many(word_token for word_token, kept in zip(word_tokens, is_kept)
+                                                if not kept and len(word_token) > 0))
+        for word_token, kept in zip(word_tokens, is_kept):
+            if kept:
+                yield word_token
+            elif len(word_token) > 0:
+                for token in next(segmented):
+                    if token not in string.punctuation and not is_number(token):
+                        yield token
+
+    def clean(self, tweet_text):
+        if self.stats is not None:
+            return self.clean_instrumented(tweet_text)
+        tweet_text = self.normalize(tweet_text)
+        cleaned_tweet = self.rewrite(tweet_text)
+        if cleaned_tweet is None:
+            cleaned_tweet = self.rewrite_sequential(tweet_text)
+        return " ".join(self.tokens(self.truncate(cleaned_tweet)))
+
+    def clean_instrumented(self, tweet_text):
+        """Same as `clean`, recording the time spent in each stage to `self.stats`.
+
+        The scan, sequential fallback and token stages exclude the time spent in the segmentation and
+        vocabulary stages they call.
+        """
+        stats = self.stats
+        hashtag_segmenter = _TimedStage(self.segmenter, stats, "hashtag_segmentation")
+        token_segmenter = _TimedStage(self.segmenter, stats, "token_segmentation")
+        vocabulary = _TimedStage(self.vocabulary, stats, "vocabulary")
+        stats.observe_length(len(tweet_text))
+        clean_start = time.perf_counter()
+
+        tweet_text = self.normalize(tweet_text)
+        stage_start, hashtag_seconds = time.perf_counter(), stats.seconds["hashtag_segmentation"]
+        cleaned_tweet = self.rewrite(tweet_text, hashtag_segmenter)
+        stage_end = time.perf_counter()
+        stats.record("scan", stage_end - stage_start - (stats.seconds["hashtag_segmentation"] - hashtag_seconds))
+        if cleaned_tweet is None:
+            hashtag_seconds = stats.seconds["hashtag_segmentation"]
+            cleaned_tweet = self.rewrite_sequential(tweet_text, hashtag_segmenter)
+            stage_start, stage_end = stage_end, time.perf_counter()
+            stats.record("sequential_fallback", stage_end - stage_start
+                         - (stats.seconds["hashtag_segmentation"] - hashtag_seconds))
+
+        cleaned_tweet = self.truncate(cleaned_tweet)
+        stage_start, stage_end = stage_end, time.perf_counter()
+        stats.record("truncation", stage_end - stage_start)
+
+        nested_seconds = stats.seconds["vocabulary"] + stats.seconds["token_segmentation"]
+        cleaned_tweet = " ".join(self.tokens(cleaned_tweet, vocabulary, token_segmenter))
+        stage_start, stage_end = stage_end, time.perf_counter()
+        stats.record("tokens", stage_end - stage_start
+                     - (stats.seconds["vocabulary"] + stats.seconds["token_segmentation"] - nested_seconds))
+        stats.record("total", stage_end - clean_start)
+        return cleaned_tweet
+
+
+TWEET_REWRITER = TweetRewriter(COMMON_ENGLISH_WORDS, WORD_SEGMENTER)
+
+
 def longest_common_substring(m, n):
-    seq_matcher = SequenceMatcher(None, m, n)
-    match = seq_matcher.find_longest_match(0, len(m), 0, len(n))
-    if match.size != 0:
-        return m[match.a: match.a + match.size]
-    return ""
+    return suffix_automaton(n).longest_common_substring(m)
 
 
 def remove_punctuations(text):
@@ -83,8 +479,9 @@ def remove_punctuations(text):
 
 
 def clean_stance_target(target, source):
+    source_automaton = suffix_automaton(source)
     while True:
-        common_substring = longest_common_substring(target, source)
+        common_substring = source_automaton.longest_common_substring(target)
         if len(common_substring) > 0 and len(common_substring) >= len(target) / 3.0:
             target = target.replace(common_substring, "")
         else:
@@ -0,0 +1,16 @@
+from collections import deque
+
+
+def bounded_map(executor, fn, iterable, max_pending=64):
+    """Like executor.map, but only keeps `max_pending` tasks in flight and pulls inputs lazily.
+
+    Results are yielded in input order, so chained bounded_maps form a pipeline whose stages are
+    connected by bounded queues.
+    """
+    pending = deque()
+    for item in iterable:
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, item))
+    while len(pending) > 0:
+        yield pending.popleft().result()
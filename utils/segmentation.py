@@ -0,0 +1,68 @@
+from collections import OrderedDict
+import pickle
+import re
+import wordninja
+import utils.io as utils_io
+
+HASHTAG_REGEX = re.compile(r"#(\w*)")
+
+
+class WordSegmenter(object):
+    """Memoized word segmentation, wordninja by default.
+
+    Results are kept in a bounded LRU cache. Segmentations added with `precompute` or `load`
+    are pinned and never evicted.
+    """
+
+    def __init__(self, max_size=100000, split=wordninja.split):
+        self.max_size = max_size
+        self.split = split
+        self.cache = OrderedDict()
+        self.pinned = {}
+        self.hits, self.misses = 0, 0
+
+    def segment(self, word):
+        if word in self.pinned:
+            self.hits += 1
+            return self.pinned[word]
+        if word in self.cache:
+            self.cache.move_to_end(word)
+            self.hits += 1
+            return self.cache[word]
+        self.misses += 1
+        segments = tuple(self.split(word))
+        self.cache[word] = segments
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+        return segments
+
+    def segment_many(self, words):
+        words = list(words)
+        segmented = {word: self.segment(word) for word in OrderedDict.fromkeys(words)}
+        return [segmented[word] for word in words]
+
+    def precompute(self, words):
+        for word in OrderedDict.fromkeys(words):
+            if word not in self.pinned:
+                self.pinned[word] = self.cache.pop(word, None) or tuple(self.split(word))
+        return len(self.pinned)
+
+    def precompute_hashtags(self, texts):
+        return self.precompute(hashtag for text in texts for hashtag in HASHTAG_REGEX.findall(text))
+
+    def save(self, path):
+        with open(utils_io.ensure_path(path), "wb") as f:
+            pickle.dump(self.pinned, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self, path):
+        with open(path, "rb") as f:
+            self.pinned.update(pickle.load(f))
+        return len(self.pinned)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "cache_size": len(self.cache),
+            "pinned_size": len(self.pinned)
+        }
@@ -1,31 +1,172 @@
+import asyncio
+import codecs
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from html.parser import HTMLParser
 import urllib3
 from urllib.parse import urlparse
-from bs4 import BeautifulSoup
 
 PAGE_NOT_FOUND = "Page not found"
 MEDIA_NOT_FOUND = "Media not found"
 
 
-class HeadlineCrawler(object):
+class TitleParser(HTMLParser):
+    """Incremental HTML parser keeping the text of the first <title> element, `done` once it is closed."""
 
     def __init__(self):
-        self.http = urllib3.PoolManager()
+        super().__init__(convert_charrefs=True)
+        self.in_title = False
+        self.done = False
+        self.parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title" and not self.done:
+            self.in_title = True
+
+    def handle_endtag(self, tag):
+        if tag == "title" and self.in_title:
+            self.in_title = False
+            self.done = True
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.parts.append(data)
+
+    @property
+    def title(self):
+        return "".join(self.parts)
+
+
+def split_media(raw_title):
+    """Split "<title> - <news media>" on the last hyphen, pipe or dash of a page title."""
+    last_hyphen_idx = raw_title.rfind("-")
+    last_pipe_idx = raw_title.rfind("|")
+    last_dash_idx = raw_title.rfind("—")
+    split_idx = max([last_hyphen_idx, last_pipe_idx, last_dash_idx])
+    if split_idx == -1:
+        return raw_title, MEDIA_NOT_FOUND
+    title, news_media = raw_title[:split_idx].strip(), raw_title[split_idx+1:]
+    return title, news_media
+
+
+class HeadlineCrawler(object):
+
+    def __init__(self, timeout=None, retries=None, maxsize=1, max_bytes=262144, chunk_size=16384):
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        kwargs = {}
+        if timeout is not None:
+            kwargs["timeout"] = urllib3.Timeout(total=timeout)
+        if retries is not None:
+            kwargs["retries"] = retries
+        self.http = urllib3.PoolManager(maxsize=maxsize, **kwargs)
 
     def crawl_url_title(self, url):
-        soup = BeautifulSoup(self.http.request('GET', url).data)
-        if soup.title is None or soup.title.string is None:
+        """Title and news media of the page at `url`, reading the page only until its title is parsed.
+
+        The body is streamed in `chunk_size` chunks and reading stops at </title> or after `max_bytes` bytes.
+        It is decoded with the charset of the Content-Type header, utf-8 by default.
+        """
+        response = self.http.request('GET', url, preload_content=False)
+        try:
+            raw_title = self.read_title(response)
+        finally:
+            # a partially read connection cannot be reused
+            response.close()
+            response.release_conn()
+        if len(raw_title) == 0:
             return PAGE_NOT_FOUND, MEDIA_NOT_FOUND
-        raw_title = soup.title.string
-        last_hyphen_idx = raw_title.rfind("-")
-        last_pipe_idx = raw_title.rfind("|")
-        last_dash_idx = raw_title.rfind("—")
-        split_idx = max([last_hyphen_idx, last_pipe_idx, last_dash_idx])
-        if split_idx == -1:
-            return raw_title, MEDIA_NOT_FOUND
-        title, news_media = raw_title[:split_idx].strip(), raw_title[split_idx+1:]
-        return title, news_media
+        return split_media(raw_title)
+
+    def read_title(self, response):
+        charset = "utf-8"
+        content_type = response.headers.get("Content-Type", "")
+        for param in content_type.split(";")[1:]:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "charset" and len(value) > 0:
+                charset = value.strip('"\'')
+        try:
+            decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+        parser = TitleParser()
+        num_bytes = 0
+        for chunk in response.stream(self.chunk_size):
+            parser.feed(decoder.decode(chunk))
+            num_bytes += len(chunk)
+            if parser.done or num_bytes >= self.max_bytes:
+                break
+        if not parser.done:
+            parser.feed(decoder.decode(b"", final=True))
+            parser.close()
+        return parser.title
+
+
+class AsyncHeadlineCrawler(object):
+    """Crawls the headlines of many urls with asyncio, running HeadlineCrawler requests on threads.
+
+    At most `concurrency` requests are in flight, requests to the same host start at least `host_interval`
+    seconds apart, and requests failing with an urllib3 error are retried `retries` times with exponential backoff.
+    Up to `redirects` redirects are followed within a request.
+    """
+
+    def __init__(self, concurrency=16, host_interval=0.5, timeout=10.0, retries=3, backoff=1.0, max_bytes=262144,
+                 redirects=5):
+        self.concurrency = concurrency
+        self.host_interval = host_interval
+        self.retries = retries
+        self.backoff = backoff
+        # failed requests are retried here with backoff instead of by urllib3, which only follows redirects.
+        # A total count would also cap the redirects, so it is left unset
+        request_retries = urllib3.Retry(total=None, connect=0, read=0, status=0, other=0, redirect=redirects)
+        self.crawler = HeadlineCrawler(timeout=timeout, retries=request_retries, maxsize=concurrency,
+                                       max_bytes=max_bytes)
+
+    def crawl(self, items, on_result):
+        """Crawl the (key, url) `items`, on_result(key, url, (title, news_media)) is called as each one finishes.
+
+        The result is None for urls that still fail after every retry.
+        """
+        asyncio.run(self.crawl_all(items, on_result))
+
+    async def crawl_all(self, items, on_result):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        host_locks, host_next_start = {}, {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            async def crawl_item(key, url):
+                try:
+                    result = await self.crawl_url_title(url, semaphore, host_locks, host_next_start, executor)
+                except urllib3.exceptions.HTTPError as e:
+                    print("Failed to crawl {}: {}".format(url, str(e)))
+                    result = None
+                on_result(key, url, result)
+
+            await asyncio.gather(*[crawl_item(key, url) for key, url in items])
+
+    async def crawl_url_title(self, url, semaphore, host_locks, host_next_start, executor):
+        loop = asyncio.get_running_loop()
+        host = urlparse(url).netloc
+        host_lock = host_locks.setdefault(host, asyncio.Lock())
+        for attempt in range(self.retries + 1):
+            # the host lock is held until the request gets a slot, so requests to a host never start too close
+            async with host_lock:
+                delay = host_next_start.get(host, 0.0) - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await semaphore.acquire()
+                host_next_start[host] = loop.time() + self.host_interval
+            try:
+                return await loop.run_in_executor(executor, self.crawler.crawl_url_title, url)
+            except urllib3.exceptions.HTTPError:
+                if attempt == self.retries:
+                    raise
+            finally:
+                semaphore.release()
+            await asyncio.sleep(self.backoff * 2 ** attempt)
 
 
+@lru_cache(maxsize=100000)
 def extract_home_url(full_url):
     parsed_uri = urlparse(full_url)
     result = '{uri.scheme}://{uri.netloc}/'.format(uri=parsed_uri)